@@ -0,0 +1,24 @@
+"""add reorder threshold
+
+Revision ID: 2b6e8f41c9d7
+Revises: 5d9f0c3b7a14
+Create Date: 2026-10-17 21:14:36.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b6e8f41c9d7'
+down_revision = '5d9f0c3b7a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('inventory_items', sa.Column('reorder_threshold', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('inventory_items', 'reorder_threshold')
@@ -0,0 +1,32 @@
+"""add inventory adjustments
+
+Revision ID: 5d9f0c3b7a14
+Revises: e4b8d2a6f310
+Create Date: 2026-10-17 18:47:12.602918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d9f0c3b7a14'
+down_revision = 'e4b8d2a6f310'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory_adjustments',
+    sa.Column('id', sa.String(length=255), nullable=False),
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_inventory_adjustments_created_at'), 'inventory_adjustments', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_inventory_adjustments_created_at'), table_name='inventory_adjustments')
+    op.drop_table('inventory_adjustments')
@@ -0,0 +1,24 @@
+"""add low stock announced at
+
+Revision ID: 7e1c5a9d3f28
+Revises: 2b6e8f41c9d7
+Create Date: 2026-10-17 23:02:51.406317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e1c5a9d3f28'
+down_revision = '2b6e8f41c9d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('inventory_items', sa.Column('low_stock_announced_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('inventory_items', 'low_stock_announced_at')
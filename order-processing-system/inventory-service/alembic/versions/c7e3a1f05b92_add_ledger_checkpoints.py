@@ -0,0 +1,29 @@
+"""add ledger checkpoints
+
+Revision ID: c7e3a1f05b92
+Revises: 9ab5de8bc905
+Create Date: 2026-10-17 16:02:31.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e3a1f05b92'
+down_revision = '9ab5de8bc905'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory_ledger_checkpoints',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('seq', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('inventory_ledger_checkpoints')
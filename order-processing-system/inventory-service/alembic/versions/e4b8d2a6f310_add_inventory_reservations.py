@@ -0,0 +1,34 @@
+"""add inventory reservations
+
+Revision ID: e4b8d2a6f310
+Revises: c7e3a1f05b92
+Create Date: 2026-10-17 17:24:55.190833
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b8d2a6f310'
+down_revision = 'c7e3a1f05b92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory_reservations',
+    sa.Column('order_id', sa.UUID(), nullable=False),
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('order_id', 'product_id')
+    )
+    op.create_index('ix_inventory_reservations_held_expires_at', 'inventory_reservations', ['expires_at'], unique=False, postgresql_where=sa.text("status = 'held'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inventory_reservations_held_expires_at', table_name='inventory_reservations', postgresql_where=sa.text("status = 'held'"))
+    op.drop_table('inventory_reservations')
@@ -0,0 +1,19 @@
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic_core import to_json
+
+
+class PydanticJSONResponse(Response):
+    """JSON response rendered by pydantic-core straight from domain models.
+
+    Returning it from a route skips FastAPI's response_model re-validation and
+    jsonable_encoder pass; the declared response_model still documents the API.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return to_json(content)
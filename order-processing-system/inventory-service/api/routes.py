@@ -1,86 +1,162 @@
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from api.responses import PydanticJSONResponse
 from application.inventory_service import InventoryService
-from domain.models import InventoryItem, InventoryResponse
+from domain.models import (
+    AdjustmentRejected,
+    InventoryItem,
+    InventoryLookupRequest,
+    InventoryResponse,
+    LowStockItem,
+    StockAdjustmentBatch,
+    StockAdjustmentResponse,
+)
+from infrastructure.bulk_import import format_for, iter_lines, parse_records
+from infrastructure.cache import inventory_cache
 from infrastructure.database import get_db_session
+from infrastructure.hot_stock import hot_stock
+from infrastructure.low_stock import low_stock
 from infrastructure.repository import InventoryRepository
 from infrastructure.message_queue import message_queue
+from infrastructure.reservation_expiry import reservation_expiry
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
 
 async def get_inventory_service(session: AsyncSession = Depends(get_db_session)) -> InventoryService:
-    repository = InventoryRepository(session)
-    return InventoryService(repository, message_queue)
+    repository = InventoryRepository(session, low_stock)
+    return InventoryService(repository, message_queue, hot_stock, reservation_expiry, inventory_cache)
+
+
+@router.get("/_cache")
+async def get_cache_stats() -> dict:
+    """Hit rate and stampede (coalesced miss) counters of the availability cache"""
+    return inventory_cache.stats()
+
+
+@router.get("/low-stock", response_model=List[LowStockItem])
+async def get_low_stock() -> PydanticJSONResponse:
+    """SKUs at or below their reorder threshold, emptiest first"""
+    return PydanticJSONResponse(low_stock.low_stock())
+
+
+@router.get("", response_model=List[InventoryResponse])
+async def list_inventory(
+    product_id: List[UUID] = Query(..., min_length=1, max_length=1000),
+    service: InventoryService = Depends(get_inventory_service)
+) -> PydanticJSONResponse:
+    """Bulk lookup: ``?product_id=...&product_id=...``; unknown products are omitted"""
+    inventories = await service.get_inventories(product_id)
+    return PydanticJSONResponse(inventories)
+
+
+@router.post("/lookup", response_model=List[InventoryResponse])
+async def lookup_inventory(
+    request: InventoryLookupRequest,
+    service: InventoryService = Depends(get_inventory_service)
+) -> PydanticJSONResponse:
+    """Bulk lookup for id lists too long for a query string"""
+    inventories = await service.get_inventories(request.product_ids)
+    return PydanticJSONResponse(inventories)
+
+
+@router.post("/adjustments", response_model=StockAdjustmentResponse)
+async def adjust_inventory(
+    request: StockAdjustmentBatch,
+    service: InventoryService = Depends(get_inventory_service)
+) -> PydanticJSONResponse:
+    """Apply signed quantity deltas atomically, all or none.
+
+    Adjustments carrying an ``idempotency_id`` that was already applied are
+    counted as duplicates and skipped.
+    """
+    try:
+        levels, duplicates = await service.adjust_inventory(request.adjustments)
+    except AdjustmentRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+    return PydanticJSONResponse(StockAdjustmentResponse(
+        applied=len(request.adjustments) - duplicates,
+        duplicates=duplicates,
+        levels=[InventoryResponse(**level.model_dump()) for level in levels],
+    ))
+
+
+@router.post("/import")
+async def import_inventory(
+    request: Request,
+    service: InventoryService = Depends(get_inventory_service)
+) -> PydanticJSONResponse:
+    """Bulk upsert a streamed CSV (text/csv) or NDJSON (application/x-ndjson) body.
+
+    Each record sets ``quantity_available`` for a ``product_id``, creating the
+    product if needed.
+    """
+    fmt = format_for(request.headers.get("content-type", ""))
+    records = parse_records(iter_lines(request.stream()), fmt)
+    try:
+        imported, skipped = await service.import_inventory(records)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    return PydanticJSONResponse({"imported": imported, "skipped": skipped})
 
 
 @router.get("/{product_id}", response_model=InventoryResponse)
 async def get_inventory(
     product_id: UUID,
     service: InventoryService = Depends(get_inventory_service)
-) -> InventoryResponse:
-    inventory = await service.get_inventory(product_id)
+) -> PydanticJSONResponse:
+    inventory = await service.get_inventory_json(product_id)
     if not inventory:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found in inventory"
         )
     
-    return InventoryResponse(
-        id=inventory.id,
-        product_id=inventory.product_id,
-        quantity_available=inventory.quantity_available,
-        reserved_quantity=inventory.reserved_quantity,
-        created_at=inventory.created_at,
-        updated_at=inventory.updated_at,
-    )
+    return PydanticJSONResponse(inventory)
 
 
 @router.put("/{product_id}", response_model=InventoryResponse)
 async def update_inventory(
     product_id: UUID,
     quantity_available: int,
+    reorder_threshold: Optional[int] = Query(None, ge=0),
     service: InventoryService = Depends(get_inventory_service)
-) -> InventoryResponse:
-    inventory = await service.update_inventory(product_id, quantity_available)
+) -> PydanticJSONResponse:
+    inventory = await service.update_inventory(product_id, quantity_available, reorder_threshold)
     if not inventory:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found in inventory"
         )
     
-    return InventoryResponse(
-        id=inventory.id,
-        product_id=inventory.product_id,
-        quantity_available=inventory.quantity_available,
-        reserved_quantity=inventory.reserved_quantity,
-        created_at=inventory.created_at,
-        updated_at=inventory.updated_at,
-    )
+    return PydanticJSONResponse(inventory)
 
 
 @router.post("", response_model=InventoryResponse, status_code=status.HTTP_201_CREATED)
 async def create_inventory(
     product_id: UUID,
     quantity_available: int,
+    reorder_threshold: int = Query(0, ge=0),
     service: InventoryService = Depends(get_inventory_service)
-) -> InventoryResponse:
+) -> PydanticJSONResponse:
     inventory = InventoryItem(
         product_id=product_id,
-        quantity_available=quantity_available
+        quantity_available=quantity_available,
+        reorder_threshold=reorder_threshold
     )
     
     created_inventory = await service.create_inventory(inventory)
     
-    return InventoryResponse(
-        id=created_inventory.id,
-        product_id=created_inventory.product_id,
-        quantity_available=created_inventory.quantity_available,
-        reserved_quantity=created_inventory.reserved_quantity,
-        created_at=created_inventory.created_at,
-        updated_at=created_inventory.updated_at,
-    )
\ No newline at end of file
+    return PydanticJSONResponse(created_inventory, status_code=status.HTTP_201_CREATED)
\ No newline at end of file
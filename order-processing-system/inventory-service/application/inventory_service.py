@@ -1,68 +1,305 @@
 import logging
-from typing import Optional
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterable, Dict, Iterable, List, Optional, Sequence, Tuple
 from uuid import UUID
 
-from domain.events import OrderCreated, InventoryReserved, InventoryUnavailable
-from domain.models import InventoryItem
+from domain.events import (
+    InventoryOversold,
+    InventoryReserved,
+    InventoryUnavailable,
+    OrderCancelled,
+    OrderCreated,
+    PaymentFailed,
+    PaymentProcessed,
+)
+from domain.models import InsufficientStock, InventoryItem, ReservationExists, ReservationHold, StockAdjustment
+from infrastructure.cache import TTLCache
+from infrastructure.hot_stock import HotStockLedger
 from infrastructure.repository import InventoryRepository
 from infrastructure.message_queue import MessageQueue
+from infrastructure.reservation_expiry import ReservationExpiry
 
 logger = logging.getLogger(__name__)
 
 
 class InventoryService:
-    def __init__(self, repository: InventoryRepository, message_queue: MessageQueue):
+    def __init__(
+        self,
+        repository: InventoryRepository,
+        message_queue: MessageQueue,
+        hot_stock: Optional[HotStockLedger] = None,
+        expiry: Optional[ReservationExpiry] = None,
+        cache: Optional[TTLCache] = None,
+    ):
         self.repository = repository
         self.message_queue = message_queue
+        self.hot_stock = hot_stock
+        self.expiry = expiry
+        self.cache = cache
 
     async def handle_order_created(self, event: OrderCreated) -> None:
         try:
-            for item in event.items:
-                inventory = await self.repository.get_by_product_id(item.product_id)
-                
-                if not inventory:
-                    unavailable_event = InventoryUnavailable(
-                        order_id=event.order_id,
-                        product_id=item.product_id,
-                        requested_quantity=item.quantity,
-                        available_quantity=0
-                    )
-                    await self.message_queue.publish_event(unavailable_event, "inventory.unavailable")
-                    return
-
-                if inventory.quantity_available < item.quantity:
-                    unavailable_event = InventoryUnavailable(
-                        order_id=event.order_id,
-                        product_id=item.product_id,
-                        requested_quantity=item.quantity,
-                        available_quantity=inventory.quantity_available
-                    )
-                    await self.message_queue.publish_event(unavailable_event, "inventory.unavailable")
-                    return
-
-            # All items available, reserve inventory
-            for item in event.items:
-                success = await self.repository.reserve_quantity(item.product_id, item.quantity)
-                if success:
-                    reserved_event = InventoryReserved(
-                        order_id=event.order_id,
-                        product_id=item.product_id,
-                        quantity=item.quantity
-                    )
-                    await self.message_queue.publish_event(reserved_event, "inventory.reserved")
-                    logger.info(f"Reserved {item.quantity} units of product {item.product_id}")
-
+            await self._reserve_order(event)
         except Exception as e:
             logger.error(f"Error handling order created event: {e}")
 
+    async def _reserve_order(self, event: OrderCreated) -> None:
+        """Reserve one order and publish its outcome; errors propagate"""
+        quantities = self._order_quantities(event)
+        hold = self._hold(event, quantities)
+
+        try:
+            await self._reserve(quantities, hold)
+        except InsufficientStock as e:
+            await self.message_queue.publish_event(self._unavailable_event(event, e), "inventory.unavailable")
+            return
+        except ReservationExists:
+            # The earlier delivery may have stopped before publishing; the
+            # payment service ignores a repeat for an order it already has
+            logger.info(f"Order {event.order_id} was already reserved, announcing it again")
+            await self.message_queue.publish_event(self._reserved_event(event), "inventory.reserved")
+            return
+
+        self._reserved(quantities, hold)
+        await self.message_queue.publish_event(self._reserved_event(event), "inventory.reserved")
+        logger.info(f"Reserved {len(quantities)} products for order {event.order_id}")
+
+    async def handle_orders_created(self, events: Sequence[OrderCreated]) -> None:
+        """Group commit: reserve a micro-batch of orders in one transaction.
+
+        Every order is still all-or-nothing and gets its own InventoryReserved
+        or InventoryUnavailable. Orders touching hot SKUs take the in-memory
+        path one by one. Database and publish errors of either path propagate
+        so the batch is redelivered; orders already committed are then
+        recognised by their reservation and their InventoryReserved is
+        published again.
+        """
+        batched = []
+        for event in events:
+            if self.hot_stock and any(self.hot_stock.is_hot(item.product_id) for item in event.items):
+                await self._reserve_order(event)
+            else:
+                batched.append(event)
+        if not batched:
+            return
+
+        orders = []
+        for event in batched:
+            quantities = self._order_quantities(event)
+            orders.append((quantities, self._hold(event, quantities)))
+        outcomes = await self.repository.reserve_orders(orders)
+
+        messages = []
+        reserved = 0
+        for event, (quantities, hold), outcome in zip(batched, orders, outcomes):
+            if outcome is None:
+                self._reserved(quantities, hold)
+                messages.append((self._reserved_event(event), "inventory.reserved"))
+                reserved += 1
+            elif isinstance(outcome, InsufficientStock):
+                messages.append((self._unavailable_event(event, outcome), "inventory.unavailable"))
+            else:
+                logger.info(f"Order {event.order_id} was already reserved, announcing it again")
+                messages.append((self._reserved_event(event), "inventory.reserved"))
+
+        await self.message_queue.publish_events(messages)
+        logger.info(f"Reserved {reserved} of {len(batched)} orders in one transaction")
+
+    async def handle_payment_processed(self, event: PaymentProcessed) -> None:
+        """A paid order keeps its units: the reservation no longer expires.
+
+        A payment that outlived its hold takes the released units again; if
+        they were sold in the meantime an InventoryOversold alert goes out.
+        """
+        if await self.repository.commit_reservations(event.order_id):
+            return
+
+        released = await self.repository.released_reservations(event.order_id)
+        if not released:
+            logger.warning(f"No reservation to commit for paid order {event.order_id}")
+            return
+
+        try:
+            await self._recommit(event.order_id, released)
+        except ReservationExists:
+            logger.info(f"Expired hold of paid order {event.order_id} was already taken again")
+            return
+        except InsufficientStock as e:
+            logger.error(f"Paid order {event.order_id} lost its expired hold: {e}")
+            oversold = InventoryOversold(
+                order_id=event.order_id,
+                product_id=e.product_id,
+                requested_quantity=e.requested_quantity,
+                available_quantity=e.available_quantity,
+            )
+            await self.message_queue.publish_event(oversold, "inventory.oversold")
+            return
+
+        self._invalidate(released)
+        logger.warning(f"Took the expired hold of paid order {event.order_id} again")
+
+    async def handle_payment_failed(self, event: PaymentFailed) -> None:
+        await self.release_reservations([event.order_id])
+
+    async def handle_order_cancelled(self, event: OrderCancelled) -> None:
+        await self.release_reservations([event.order_id])
+
+    async def release_reservations(
+        self, order_ids: Sequence[UUID], expired_before: Optional[datetime] = None
+    ) -> Dict[UUID, int]:
+        """Return the held units of the given orders to sellable stock"""
+        in_memory = self.hot_stock.hot_ids if self.hot_stock else frozenset()
+        released = await self.repository.release_reservations(order_ids, expired_before, in_memory)
+        self._invalidate(released)
+        hot = {product_id: n for product_id, n in released.items() if product_id in in_memory}
+        if hot:
+            await self.hot_stock.release(hot)
+        if released:
+            logger.info(f"Released {sum(released.values())} units from {len(order_ids)} orders")
+        return released
+
     async def get_inventory(self, product_id: UUID) -> Optional[InventoryItem]:
         """Get inventory for a product"""
-        return await self.repository.get_by_product_id(product_id)
+        inventory = await self.repository.get_by_product_id(product_id)
+        if inventory and self.hot_stock:
+            return self.hot_stock.overlay(inventory)
+        return inventory
+
+    async def get_inventory_json(self, product_id: UUID) -> Optional[bytes]:
+        """Serialized inventory, answered from the availability cache when possible.
 
-    async def update_inventory(self, product_id: UUID, quantity_available: int) -> Optional[InventoryItem]:
-        """Update inventory quantity"""
-        return await self.repository.update_quantity(product_id, quantity_available)
+        Hot SKUs change on every reservation and are always read live.
+        """
+        if self.cache is None or (self.hot_stock and self.hot_stock.is_hot(product_id)):
+            inventory = await self.get_inventory(product_id)
+            return inventory.model_dump_json().encode() if inventory else None
+
+        async def load() -> Optional[bytes]:
+            inventory = await self.repository.get_by_product_id(product_id)
+            return inventory.model_dump_json().encode() if inventory else None
+
+        return await self.cache.get_or_load(product_id, load)
+
+    async def get_inventories(self, product_ids: Sequence[UUID]) -> List[InventoryItem]:
+        """Get inventory for many products in one query"""
+        inventories = await self.repository.get_many(list(dict.fromkeys(product_ids)))
+        if self.hot_stock:
+            return [self.hot_stock.overlay(inventory) for inventory in inventories]
+        return inventories
+
+    async def update_inventory(
+        self, product_id: UUID, quantity_available: int, reorder_threshold: Optional[int] = None
+    ) -> Optional[InventoryItem]:
+        """Update inventory quantity and, optionally, its reorder threshold"""
+        if self.hot_stock and self.hot_stock.is_hot(product_id):
+            return await self.hot_stock.replace(
+                product_id,
+                quantity_available,
+                lambda: self.repository.update_quantity(product_id, quantity_available, reorder_threshold),
+            )
+        inventory = await self.repository.update_quantity(product_id, quantity_available, reorder_threshold)
+        self._invalidate([product_id])
+        return inventory
+
+    async def adjust_inventory(self, adjustments: Sequence[StockAdjustment]) -> Tuple[List[InventoryItem], int]:
+        """Apply a batch of signed stock deltas atomically; returns (levels, duplicates)"""
+        async def write() -> Tuple[List[InventoryItem], int]:
+            levels, duplicates = await self.repository.apply_adjustments(adjustments)
+            if self.hot_stock:
+                self.hot_stock.adopt(levels)
+            return levels, duplicates
+
+        hot = [a.product_id for a in adjustments if self.hot_stock and self.hot_stock.is_hot(a.product_id)]
+        if hot:
+            levels, duplicates = await self.hot_stock.write_through(hot, write)
+        else:
+            levels, duplicates = await write()
+
+        self._invalidate(level.product_id for level in levels)
+        return levels, duplicates
+
+    async def import_inventory(self, records: AsyncIterable[Tuple[UUID, int]]) -> Tuple[int, int]:
+        """Bulk upsert (product_id, quantity_available) records; hot SKUs are skipped"""
+        skip = self.hot_stock.product_ids if self.hot_stock else frozenset()
+        imported, skipped = await self.repository.bulk_upsert(records, skip)
+        if self.cache is not None:
+            self.cache.clear()
+        logger.info(f"Imported {imported} inventory records, skipped {skipped} hot SKUs")
+        return imported, skipped
 
     async def create_inventory(self, inventory: InventoryItem) -> InventoryItem:
         """Create new inventory item"""
-        return await self.repository.create(inventory)
\ No newline at end of file
+        created = await self.repository.create(inventory)
+        self._invalidate([created.product_id])
+        return created
+
+    async def _reserve(self, quantities: Dict[UUID, int], hold: Optional[ReservationHold] = None) -> None:
+        """Reserve hot SKUs in memory and the rest in Postgres, all or nothing"""
+        if not self.hot_stock:
+            await self.repository.reserve_order(quantities, hold)
+            return
+
+        hot = {product_id: n for product_id, n in quantities.items() if self.hot_stock.is_hot(product_id)}
+        cold = {product_id: n for product_id, n in quantities.items() if product_id not in hot}
+        if not hot:
+            await self.repository.reserve_order(cold, hold)
+            return
+
+        write = None
+        if cold or hold:
+            write = lambda: self.repository.reserve_order(cold, hold)
+        await self.hot_stock.reserve(hot, write)
+
+    async def _recommit(self, order_id: UUID, quantities: Dict[UUID, int]) -> None:
+        """Take released units again, hot SKUs in memory, all or nothing"""
+        if not self.hot_stock:
+            await self.repository.recommit_reservations(order_id, quantities)
+            return
+
+        hot = {product_id: n for product_id, n in quantities.items() if self.hot_stock.is_hot(product_id)}
+        cold = {product_id: n for product_id, n in quantities.items() if product_id not in hot}
+        if not hot:
+            await self.repository.recommit_reservations(order_id, cold)
+            return
+        await self.hot_stock.reserve(hot, lambda: self.repository.recommit_reservations(order_id, cold))
+
+    def _order_quantities(self, event: OrderCreated) -> Dict[UUID, int]:
+        quantities: Dict[UUID, int] = defaultdict(int)
+        for item in event.items:
+            quantities[item.product_id] += item.quantity
+        return dict(quantities)
+
+    def _hold(self, event: OrderCreated, quantities: Dict[UUID, int]) -> Optional[ReservationHold]:
+        if not self.expiry:
+            return None
+        return ReservationHold(
+            order_id=event.order_id,
+            quantities=quantities,
+            expires_at=self.expiry.deadline(),
+        )
+
+    def _reserved(self, quantities: Dict[UUID, int], hold: Optional[ReservationHold]) -> None:
+        self._invalidate(quantities)
+        if hold:
+            self.expiry.schedule(hold.order_id, hold.expires_at)
+
+    def _reserved_event(self, event: OrderCreated) -> InventoryReserved:
+        return InventoryReserved(
+            order_id=event.order_id,
+            items=event.items,
+            total_amount=event.total_amount
+        )
+
+    def _unavailable_event(self, event: OrderCreated, shortfall: InsufficientStock) -> InventoryUnavailable:
+        return InventoryUnavailable(
+            order_id=event.order_id,
+            product_id=shortfall.product_id,
+            requested_quantity=shortfall.requested_quantity,
+            available_quantity=shortfall.available_quantity
+        )
+
+    def _invalidate(self, product_ids: Iterable[UUID]) -> None:
+        if self.cache is not None:
+            for product_id in product_ids:
+                self.cache.invalidate(product_id)
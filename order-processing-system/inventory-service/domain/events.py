@@ -26,10 +26,11 @@ class OrderCreated(DomainEvent):
 
 
 class InventoryReserved(DomainEvent):
+    """Every line of an order was reserved; one event per order"""
     event_type: str = "InventoryReserved"
     order_id: UUID
-    product_id: UUID
-    quantity: int
+    items: List[OrderItem]
+    total_amount: float
 
 
 class InventoryUnavailable(DomainEvent):
@@ -37,4 +38,41 @@ class InventoryUnavailable(DomainEvent):
     order_id: UUID
     product_id: UUID
     requested_quantity: int
-    available_quantity: int
\ No newline at end of file
+    available_quantity: int
+
+
+class InventoryLowStock(DomainEvent):
+    """A product fell to or below its reorder threshold; sent once per crossing"""
+    event_type: str = "InventoryLowStock"
+    product_id: UUID
+    quantity_available: int
+    reorder_threshold: int
+
+
+class InventoryOversold(DomainEvent):
+    """A paid order's expired hold could not be taken again; needs a manual decision"""
+    event_type: str = "InventoryOversold"
+    order_id: UUID
+    product_id: UUID
+    requested_quantity: int
+    available_quantity: int
+
+
+class OrderCancelled(DomainEvent):
+    event_type: str = "OrderCancelled"
+    order_id: UUID
+    reason: str
+
+
+class PaymentProcessed(DomainEvent):
+    event_type: str = "PaymentProcessed"
+    order_id: UUID
+    payment_id: UUID
+    amount: float
+
+
+class PaymentFailed(DomainEvent):
+    event_type: str = "PaymentFailed"
+    order_id: UUID
+    payment_id: UUID
+    reason: str
\ No newline at end of file
@@ -1,5 +1,6 @@
 from datetime import datetime
-from typing import Optional
+from enum import Enum
+from typing import Dict, List, Optional
 from uuid import UUID, uuid4
 
 from pydantic import BaseModel, Field
@@ -10,19 +11,92 @@ class InventoryItem(BaseModel):
     product_id: UUID
     quantity_available: int = Field(ge=0)
     reserved_quantity: int = Field(ge=0, default=0)
+    reorder_threshold: int = Field(ge=0, default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
 
 
+class InsufficientStock(Exception):
+    """An order asked for more units of a product than are available"""
+
+    def __init__(self, product_id: UUID, requested_quantity: int, available_quantity: int):
+        self.product_id = product_id
+        self.requested_quantity = requested_quantity
+        self.available_quantity = available_quantity
+        super().__init__(
+            f"Product {product_id}: requested {requested_quantity}, available {available_quantity}"
+        )
+
+
+class ReservationExists(Exception):
+    """The order's reservation was already recorded, e.g. a redelivered OrderCreated"""
+
+    def __init__(self, order_id: UUID):
+        self.order_id = order_id
+        super().__init__(f"Order {order_id} already has a reservation")
+
+
+class AdjustmentRejected(Exception):
+    """A stock adjustment batch named unknown products or would drive stock negative"""
+
+    def __init__(self, product_ids: List[UUID]):
+        self.product_ids = product_ids
+        super().__init__(
+            "Adjustments rejected for products: " + ", ".join(str(p) for p in product_ids)
+        )
+
+
+class ReservationStatus(str, Enum):
+    HELD = "held"
+    COMMITTED = "committed"
+    RELEASED = "released"
+
+
+class ReservationHold(BaseModel):
+    """Per-order record of reserved units, released again unless committed by expires_at"""
+    order_id: UUID
+    quantities: Dict[UUID, int]
+    expires_at: datetime
+
+
 class ReserveInventoryRequest(BaseModel):
     product_id: UUID
     quantity: int = Field(gt=0)
 
 
+class InventoryLookupRequest(BaseModel):
+    product_ids: List[UUID] = Field(min_length=1, max_length=1000)
+
+
+class StockAdjustment(BaseModel):
+    product_id: UUID
+    delta: int
+    idempotency_id: Optional[str] = Field(None, min_length=1, max_length=255)
+
+
+class StockAdjustmentBatch(BaseModel):
+    adjustments: List[StockAdjustment] = Field(min_length=1, max_length=10000)
+
+
+class LowStockItem(BaseModel):
+    """A SKU at or below its reorder threshold"""
+    product_id: UUID
+    quantity_available: int
+    reorder_threshold: int
+    since: datetime = Field(default_factory=datetime.utcnow)
+
+
 class InventoryResponse(BaseModel):
     id: UUID
     product_id: UUID
     quantity_available: int
     reserved_quantity: int
+    reorder_threshold: int = 0
     created_at: datetime
-    updated_at: Optional[datetime] = None
\ No newline at end of file
+    updated_at: Optional[datetime] = None
+
+
+class StockAdjustmentResponse(BaseModel):
+    applied: int
+    duplicates: int
+    levels: List[InventoryResponse]
@@ -0,0 +1,30 @@
+import argparse
+import asyncio
+import time
+
+from application.inventory_service import InventoryService
+from infrastructure.bulk_import import CSV, NDJSON, from_iterable, parse_records
+from infrastructure.database import get_db_session
+from infrastructure.hot_stock import hot_stock
+from infrastructure.repository import InventoryRepository
+from infrastructure.message_queue import message_queue
+
+
+async def import_file(path: str, fmt: str) -> None:
+    async for session in get_db_session():
+        service = InventoryService(InventoryRepository(session), message_queue, hot_stock)
+        started = time.perf_counter()
+        with open(path) as lines:
+            imported, _ = await service.import_inventory(parse_records(from_iterable(lines), fmt))
+        elapsed = time.perf_counter() - started
+        print(f"Imported {imported} records in {elapsed:.1f}s ({imported / elapsed:,.0f} rows/s)")
+        break
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import inventory from CSV or NDJSON")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=[CSV, NDJSON], help="defaults to the file extension")
+    args = parser.parse_args()
+    fmt = args.format or (NDJSON if args.path.endswith((".ndjson", ".jsonl")) else CSV)
+    asyncio.run(import_file(args.path, fmt))
@@ -0,0 +1,60 @@
+import json
+from typing import AsyncIterable, AsyncIterator, Iterable, Tuple
+from uuid import UUID
+
+CSV = "csv"
+NDJSON = "ndjson"
+
+InventoryRecord = Tuple[UUID, int]
+
+
+def format_for(content_type: str) -> str:
+    """Pick the import format from a Content-Type header"""
+    if "json" in content_type:
+        return NDJSON
+    return CSV
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a streamed body into decoded lines without buffering all of it"""
+    remainder = b""
+    async for chunk in chunks:
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line.decode()
+    if remainder:
+        yield remainder.decode()
+
+
+async def parse_records(lines: AsyncIterable[str], fmt: str) -> AsyncIterator[InventoryRecord]:
+    """Yield (product_id, quantity_available) pairs from CSV or NDJSON lines.
+
+    CSV rows are ``product_id,quantity_available`` with an optional header;
+    NDJSON objects carry the same two keys. Blank lines are skipped.
+    """
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            if fmt == NDJSON:
+                data = json.loads(line)
+                product_id, quantity = data["product_id"], data["quantity_available"]
+            else:
+                product_id, quantity = (field.strip().strip('"') for field in line.split(","))
+                if line_number == 1 and product_id == "product_id":
+                    continue
+            record = (UUID(product_id), int(quantity))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid inventory record on line {line_number}: {e}") from e
+        if record[1] < 0:
+            raise ValueError(f"Invalid inventory record on line {line_number}: negative quantity")
+        yield record
+
+
+async def from_iterable(lines: Iterable[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line
@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import BigInteger, Column, Index, Integer, String, DateTime, text
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import os
@@ -20,9 +20,49 @@ class InventoryItem(Base):
     product_id = Column(UUID(as_uuid=True), unique=True, index=True)
     quantity = Column(Integer, default=0)
     reserved_quantity = Column(Integer, default=0)
+    # Low-stock alert level; 0 still reports stock-outs
+    reorder_threshold = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    # Set when the current low-stock crossing was announced
+    low_stock_announced_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class LedgerCheckpoint(Base):
+    """Last hot-stock journal sequence number whose deltas are in inventory_items"""
+    __tablename__ = "inventory_ledger_checkpoints"
+
+    name = Column(String(64), primary_key=True)
+    seq = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class InventoryReservation(Base):
+    __tablename__ = "inventory_reservations"
+
+    order_id = Column(UUID(as_uuid=True), primary_key=True)
+    product_id = Column(UUID(as_uuid=True), primary_key=True)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String(16), nullable=False, default="held")
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Only held reservations are ever scanned for expiry
+        Index(
+            "ix_inventory_reservations_held_expires_at",
+            "expires_at",
+            postgresql_where=text("status = 'held'"),
+        ),
+    )
+
+class InventoryAdjustment(Base):
+    """Idempotency ids of applied stock adjustments"""
+    __tablename__ = "inventory_adjustments"
+
+    id = Column(String(255), primary_key=True)
+    product_id = Column(UUID(as_uuid=True), nullable=False)
+    delta = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, KeysView, List, Optional, Set, Tuple, TypeVar
+from uuid import UUID
+
+from sqlalchemy import column, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, insert
+from sqlalchemy.orm import sessionmaker
+
+from domain.models import InsufficientStock, InventoryItem
+from .database import AsyncSessionLocal, InventoryItem as InventoryModel, LedgerCheckpoint
+from .low_stock import LowStockWatcher, low_stock
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class HotStockLedger:
+    """Authoritative in-memory stock counters for designated hot SKUs.
+
+    Reservations of hot SKUs are decided under a per-SKU asyncio lock without
+    touching Postgres. Each one is appended to a local journal and the
+    aggregated deltas are flushed to ``inventory_items`` periodically, together
+    with the journal sequence number they cover. On startup the journal entries
+    past that checkpoint are replayed. Every journal append is fsynced before
+    the reservation or release returns, so nothing that was acknowledged is
+    lost, not even on an OS crash; that costs one fsync per order.
+
+    Only one service instance may own the hot SKUs at a time.
+    """
+
+    def __init__(
+        self,
+        session_maker: sessionmaker,
+        product_ids: Iterable[UUID],
+        journal_path: str,
+        flush_interval: float = 0.5,
+        name: str = "hot_stock",
+        low_stock: Optional[LowStockWatcher] = None,
+    ):
+        self.session_maker = session_maker
+        self.product_ids: Set[UUID] = set(product_ids)
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.name = name
+        self.low_stock = low_stock
+        self._available: Dict[UUID, int] = {}
+        self._pending: Dict[UUID, int] = defaultdict(int)
+        self._journal: List[Tuple[int, UUID, int]] = []
+        self._locks: Dict[UUID, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._flush_lock = asyncio.Lock()
+        self._seq = 0
+        self._journal_file = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.product_ids)
+
+    @property
+    def hot_ids(self) -> KeysView[UUID]:
+        return self._available.keys()
+
+    def is_hot(self, product_id: UUID) -> bool:
+        return product_id in self._available
+
+    async def load(self) -> None:
+        """Read the hot rows and checkpoint from Postgres, then replay the journal"""
+        async with self.session_maker() as session:
+            checkpoint = await session.get(LedgerCheckpoint, self.name)
+            result = await session.execute(
+                select(InventoryModel.product_id, InventoryModel.quantity, InventoryModel.reorder_threshold)
+                .where(InventoryModel.product_id.in_(self.product_ids))
+            )
+            rows = result.all()
+
+        quantities = {product_id: quantity for product_id, quantity, _ in rows}
+        self.restore(quantities, checkpoint.seq if checkpoint else 0)
+        if self.low_stock:
+            self.low_stock.pin({product_id: threshold for product_id, _, threshold in rows})
+            for product_id, available in self._available.items():
+                self.low_stock.observe(product_id, available)
+        logger.info(f"Hot stock ledger loaded {len(quantities)} SKUs at seq {self._seq}")
+
+    def restore(self, quantities: Dict[UUID, int], flushed_seq: int) -> None:
+        """Rebuild the counters from flushed quantities plus unflushed journal entries"""
+        self._available = dict(quantities)
+        self._pending = defaultdict(int)
+        self._journal = []
+        self._seq = flushed_seq
+        for seq, product_id, quantity in self._read_journal():
+            self._seq = max(self._seq, seq)
+            if seq > flushed_seq and product_id in self._available:
+                self._available[product_id] -= quantity
+                self._pending[product_id] += quantity
+                self._journal.append((seq, product_id, quantity))
+        self._rewrite_journal()
+
+    async def reserve(
+        self,
+        quantities: Dict[UUID, int],
+        also: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> None:
+        """Reserve hot SKUs all-or-nothing, raising InsufficientStock on a shortfall.
+
+        ``also`` runs while the SKU locks are held, after the in-memory check;
+        the hot reservation is only applied if it succeeds. It lets an order
+        that mixes hot and regular SKUs stay atomic.
+        """
+        product_ids = sorted(quantities)
+        locks = [self._locks[product_id] for product_id in product_ids]
+        for lock in locks:
+            await lock.acquire()
+        try:
+            for product_id in product_ids:
+                if self._available[product_id] < quantities[product_id]:
+                    raise InsufficientStock(
+                        product_id, quantities[product_id], self._available[product_id]
+                    )
+            if also is not None:
+                await also()
+            self._apply(quantities)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    async def release(self, quantities: Dict[UUID, int]) -> None:
+        """Give reserved units of hot SKUs back to the in-memory counters"""
+        for product_id in sorted(quantities):
+            async with self._locks[product_id]:
+                self._apply({product_id: -quantities[product_id]})
+
+    async def replace(self, product_id: UUID, quantity: int, write: Callable[[], Awaitable[T]]) -> T:
+        """Set a hot SKU's quantity through ``write`` once its deltas are flushed"""
+        async with self._locks[product_id]:
+            await self.flush()
+            result = await write()
+            self._available[product_id] = quantity
+            return result
+
+    async def write_through(self, product_ids: Iterable[UUID], write: Callable[[], Awaitable[T]]) -> T:
+        """Run ``write`` against the hot rows themselves with those SKUs locked.
+
+        Their deltas are flushed first; ``write`` must hand the resulting
+        levels to ``adopt`` before it returns.
+        """
+        locks = [self._locks[product_id] for product_id in sorted(set(product_ids))]
+        for lock in locks:
+            await lock.acquire()
+        try:
+            await self.flush()
+            return await write()
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def adopt(self, items: Iterable[InventoryItem]) -> None:
+        """Take the stored levels of hot SKUs written through Postgres"""
+        for item in items:
+            if item.product_id in self._available:
+                self._available[item.product_id] = item.quantity_available
+
+    def overlay(self, item: InventoryItem) -> InventoryItem:
+        """Show a stored row with the reservations that are not flushed yet"""
+        available = self._available.get(item.product_id)
+        if available is None:
+            return item
+        unflushed = item.quantity_available - available
+        return item.model_copy(update={
+            "quantity_available": available,
+            "reserved_quantity": item.reserved_quantity + unflushed,
+        })
+
+    async def run(self) -> None:
+        logger.info(f"Hot stock ledger flushing every {self.flush_interval}s")
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error flushing hot stock ledger: {e}")
+
+    async def flush(self) -> int:
+        """Write the aggregated deltas and the covered journal seq in one transaction"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            pending, self._pending = self._pending, defaultdict(int)
+            flushed_seq = self._seq
+            try:
+                await self._write_deltas(pending, flushed_seq)
+            except BaseException:
+                for product_id, quantity in pending.items():
+                    self._pending[product_id] += quantity
+                raise
+
+            self._journal = [entry for entry in self._journal if entry[0] > flushed_seq]
+            self._rewrite_journal()
+            return len(pending)
+
+    async def close(self) -> None:
+        if self._journal_file is None:
+            return
+        await self.flush()
+        self._journal_file.close()
+        self._journal_file = None
+
+    def _apply(self, quantities: Dict[UUID, int]) -> None:
+        """Journal and apply reserved (positive) or released (negative) units"""
+        entries = []
+        for product_id in sorted(quantities):
+            self._seq += 1
+            entries.append((self._seq, product_id, quantities[product_id]))
+        self._append_journal(entries)
+        for _, product_id, quantity in entries:
+            self._available[product_id] -= quantity
+            self._pending[product_id] += quantity
+            if self.low_stock:
+                self.low_stock.observe(product_id, self._available[product_id])
+
+    async def _write_deltas(self, pending: Dict[UUID, int], flushed_seq: int) -> None:
+        items = InventoryModel.__table__
+        deltas = values(
+            column("product_id", PG_UUID(as_uuid=True)),
+            column("quantity", items.c.quantity.type),
+            name="deltas",
+        ).data(list(pending.items()))
+
+        async with self.session_maker() as session:
+            async with session.begin():
+                await session.execute(
+                    update(items)
+                    .where(items.c.product_id == deltas.c.product_id)
+                    .values(
+                        quantity=items.c.quantity - deltas.c.quantity,
+                        reserved_quantity=items.c.reserved_quantity + deltas.c.quantity,
+                    )
+                )
+                await session.execute(
+                    insert(LedgerCheckpoint)
+                    .values(name=self.name, seq=flushed_seq)
+                    .on_conflict_do_update(index_elements=["name"], set_={"seq": flushed_seq})
+                )
+
+    def _read_journal(self) -> List[Tuple[int, UUID, int]]:
+        if not os.path.exists(self.journal_path):
+            return []
+        entries = []
+        with open(self.journal_path) as journal:
+            for line in journal:
+                parts = line.split()
+                # A torn last line from a crash mid-write is ignored
+                if len(parts) == 3:
+                    entries.append((int(parts[0]), UUID(parts[1]), int(parts[2])))
+        return entries
+
+    def _append_journal(self, entries: List[Tuple[int, UUID, int]]) -> None:
+        self._journal_file.write("".join(f"{seq} {product_id} {quantity}\n" for seq, product_id, quantity in entries))
+        self._journal_file.flush()
+        # Durable before the caller acknowledges the reservation
+        os.fsync(self._journal_file.fileno())
+        self._journal.extend(entries)
+
+    def _rewrite_journal(self) -> None:
+        """Atomically replace the journal with the entries not flushed yet"""
+        if self._journal_file is not None:
+            self._journal_file.close()
+        temporary_path = f"{self.journal_path}.tmp"
+        with open(temporary_path, "w") as journal:
+            journal.writelines(f"{seq} {product_id} {quantity}\n" for seq, product_id, quantity in self._journal)
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temporary_path, self.journal_path)
+        self._journal_file = open(self.journal_path, "a")
+
+
+def _hot_skus(raw: str) -> Set[UUID]:
+    return {UUID(value.strip()) for value in raw.split(",") if value.strip()}
+
+
+# Global instance
+hot_stock = HotStockLedger(
+    AsyncSessionLocal,
+    _hot_skus(os.getenv("HOT_SKUS", "")),
+    journal_path=os.getenv("HOT_STOCK_JOURNAL", "hot_stock.journal"),
+    flush_interval=float(os.getenv("HOT_STOCK_FLUSH_INTERVAL", "0.5")),
+    low_stock=low_stock,
+)
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import sessionmaker
+
+from domain.events import InventoryLowStock
+from domain.models import InventoryItem, LowStockItem
+from .database import AsyncSessionLocal, InventoryItem as InventoryModel
+
+logger = logging.getLogger(__name__)
+
+
+class LowStockWatcher:
+    """In-memory projection of the SKUs at or below their reorder threshold.
+
+    The write paths report every level they commit through ``observe``, so a
+    product going low costs one dict lookup per write instead of a periodic
+    scan of ``inventory_items``. Each crossing queues one InventoryLowStock
+    event; a SKU leaves the set once it is restocked above its threshold.
+
+    The table is only read on startup and after bulk imports. Between those,
+    an instance sees the writes it makes itself, so each crossing is noticed
+    by the instance that wrote it. Before publishing, the event is claimed on
+    ``inventory_items.low_stock_announced_at``: SKUs every instance finds low
+    on startup are announced once, and only if no announcement was recorded.
+    """
+
+    def __init__(self, session_maker: sessionmaker):
+        self.session_maker = session_maker
+        self._low: Dict[UUID, LowStockItem] = {}
+        self._pinned: Dict[UUID, int] = {}
+        # Each event with the announcement time it supersedes (None: only if never announced)
+        self._events: "asyncio.Queue[Tuple[InventoryLowStock, Optional[datetime]]]" = asyncio.Queue()
+
+    def pin(self, thresholds: Dict[UUID, int]) -> None:
+        """Remember thresholds of SKUs whose levels change outside Postgres (hot SKUs)"""
+        self._pinned.update(thresholds)
+
+    def observe(self, product_id: UUID, quantity: int, threshold: Optional[int] = None) -> None:
+        """Record a committed level; ``threshold`` may be omitted for pinned SKUs"""
+        if threshold is None:
+            threshold = self._pinned.get(product_id)
+            if threshold is None:
+                return
+        elif product_id in self._pinned:
+            self._pinned[product_id] = threshold
+
+        if quantity > threshold:
+            self._low.pop(product_id, None)
+            return
+
+        low = self._low.get(product_id)
+        if low is not None:
+            low.quantity_available = quantity
+            low.reorder_threshold = threshold
+            return
+
+        low = LowStockItem(product_id=product_id, quantity_available=quantity, reorder_threshold=threshold)
+        self._low[product_id] = low
+        event = InventoryLowStock(product_id=product_id, quantity_available=quantity, reorder_threshold=threshold)
+        self._events.put_nowait((event, low.since))
+
+    def observe_items(self, items: Iterable[InventoryItem]) -> None:
+        for item in items:
+            self.observe(item.product_id, item.quantity_available, item.reorder_threshold)
+
+    def low_stock(self) -> List[LowStockItem]:
+        """Current low SKUs, emptiest first"""
+        return sorted(self._low.values(), key=lambda item: (item.quantity_available, item.since))
+
+    def pending(self) -> int:
+        return self._events.qsize()
+
+    async def load(self) -> None:
+        """Rebuild the set from ``inventory_items``.
+
+        Announcements of SKUs that were restocked are cleared first. Low SKUs
+        with no recorded announcement get their event; the claim in ``run``
+        keeps several instances loading at once from announcing them twice.
+        """
+        async with self.session_maker() as session:
+            await session.execute(
+                update(InventoryModel)
+                .where(InventoryModel.quantity > InventoryModel.reorder_threshold)
+                .where(InventoryModel.low_stock_announced_at.is_not(None))
+                .values(low_stock_announced_at=None)
+            )
+            await session.commit()
+            result = await session.execute(
+                select(
+                    InventoryModel.product_id,
+                    InventoryModel.quantity,
+                    InventoryModel.reorder_threshold,
+                    InventoryModel.low_stock_announced_at,
+                )
+                .where(InventoryModel.quantity <= InventoryModel.reorder_threshold)
+            )
+            rows = result.all()
+
+        previous, self._low = self._low, {}
+        fresh = 0
+        for product_id, quantity, threshold, announced_at in rows:
+            if product_id in self._pinned:
+                self._pinned[product_id] = threshold
+            low = previous.get(product_id)
+            if low is None:
+                low = LowStockItem(product_id=product_id, quantity_available=quantity, reorder_threshold=threshold)
+                if announced_at is None:
+                    # Known here already means its event is queued
+                    event = InventoryLowStock(
+                        product_id=product_id, quantity_available=quantity, reorder_threshold=threshold
+                    )
+                    self._events.put_nowait((event, None))
+                    fresh += 1
+            low.quantity_available = quantity
+            low.reorder_threshold = threshold
+            self._low[product_id] = low
+        logger.info(f"Loaded {len(self._low)} low-stock SKUs, {fresh} not announced yet")
+
+    async def run(self, publish: Callable[[InventoryLowStock], Awaitable[None]]) -> None:
+        """Publish queued low-stock events one by one, each once across instances"""
+        logger.info("Low-stock watcher started")
+        while True:
+            event, supersedes = await self._events.get()
+            try:
+                announced_at = await self._claim(event.product_id, supersedes)
+                if announced_at is None:
+                    continue
+                try:
+                    await publish(event)
+                except Exception:
+                    await self._unclaim(event.product_id, announced_at)
+                    raise
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error publishing low-stock event for {event.product_id}: {e}")
+                self._events.put_nowait((event, supersedes))
+                await asyncio.sleep(1.0)
+
+    async def _claim(self, product_id: UUID, supersedes: Optional[datetime]) -> Optional[datetime]:
+        """Record the announcement unless one is there already; returns its time if claimed.
+
+        A crossing seen at runtime supersedes announcements made before it;
+        one found on load only claims SKUs that were never announced.
+        """
+        announced = InventoryModel.low_stock_announced_at.is_(None)
+        if supersedes is not None:
+            announced = announced | (InventoryModel.low_stock_announced_at < supersedes)
+        now = datetime.utcnow()
+        async with self.session_maker() as session:
+            result = await session.execute(
+                update(InventoryModel)
+                .where(InventoryModel.product_id == product_id)
+                .where(announced)
+                .values(low_stock_announced_at=now)
+                .returning(InventoryModel.product_id)
+            )
+            claimed = result.scalar_one_or_none() is not None
+            await session.commit()
+        return now if claimed else None
+
+    async def _unclaim(self, product_id: UUID, announced_at: datetime) -> None:
+        async with self.session_maker() as session:
+            await session.execute(
+                update(InventoryModel)
+                .where(InventoryModel.product_id == product_id)
+                .where(InventoryModel.low_stock_announced_at == announced_at)
+                .values(low_stock_announced_at=None)
+            )
+            await session.commit()
+
+
+# Global instance
+low_stock = LowStockWatcher(AsyncSessionLocal)
@@ -2,13 +2,13 @@ import asyncio
 import json
 import logging
 import os
-from typing import Callable, Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
 
 import aio_pika
 from aio_pika import Message, connect_robust
 from aio_pika.abc import AbstractIncomingMessage
 
-from domain.events import DomainEvent, OrderCreated
+from domain.events import DomainEvent, OrderCancelled, OrderCreated, PaymentFailed, PaymentProcessed
 
 logger = logging.getLogger(__name__)
 
@@ -31,15 +31,34 @@ class MessageQueue:
         if not self.channel:
             await self.connect()
 
-        message = Message(
-            event.json().encode(),
-            content_type="application/json",
-            headers={"event_type": event.event_type}
-        )
-
+        message = self._build_message(event.json().encode(), event.event_type)
         await self.exchange.publish(message, routing_key=routing_key)
         logger.info(f"Published event {event.event_type} with routing key {routing_key}")
 
+    async def publish_events(self, events: Sequence[Tuple[DomainEvent, str]]) -> None:
+        """Publish several events concurrently so broker confirms are pipelined"""
+        if not events:
+            return
+        if not self.channel:
+            await self.connect()
+
+        await asyncio.gather(*(
+            self.exchange.publish(
+                self._build_message(event.json().encode(), event.event_type),
+                routing_key=routing_key,
+            )
+            for event, routing_key in events
+        ))
+        logger.info(f"Published batch of {len(events)} events")
+
+    @staticmethod
+    def _build_message(body: bytes, event_type: str) -> Message:
+        return Message(
+            body,
+            content_type="application/json",
+            headers={"event_type": event_type}
+        )
+
     async def subscribe_to_events(self, routing_keys: list[str], callback: Callable) -> None:
         if not self.channel:
             await self.connect()
@@ -52,23 +71,128 @@ class MessageQueue:
         async def message_handler(message: AbstractIncomingMessage) -> None:
             async with message.process():
                 try:
-                    event_data = json.loads(message.body.decode())
-                    event_type = message.headers.get("event_type")
-                    
-                    # Parse specific event types
-                    event = None
-                    if event_type == "OrderCreated":
-                        event = OrderCreated(**event_data)
+                    event = self._parse_event(message)
                     
                     if event:
                         await callback(event)
-                        logger.info(f"Processed event {event_type}")
+                        logger.info(f"Processed event {event.event_type}")
                 except Exception as e:
                     logger.error(f"Error processing message: {e}")
                     raise
 
         await queue.consume(message_handler)
 
+    async def subscribe_batched(
+        self,
+        routing_keys: list[str],
+        callback: Callable,
+        max_batch_size: int = 100,
+        max_wait: float = 0.005,
+    ) -> None:
+        """Consume events in micro-batches bounded by size and max wait.
+
+        The callback receives the list of parsed events. The whole batch is
+        acked with one multiple-ack once it returns, or requeued if it raises.
+        A batch that fails again after being redelivered is retried one event
+        at a time, and only the events that still fail are rejected for good,
+        so one poison message cannot block the queue. The consumer gets a channel of its own: a multiple-ack covers every
+        unacked delivery on its channel, including other consumers' ones.
+        """
+        if not self.channel:
+            await self.connect()
+
+        channel = await self.connection.channel()
+        await channel.set_qos(prefetch_count=max_batch_size * 2)
+        queue = await channel.declare_queue("", exclusive=True)
+
+        for routing_key in routing_keys:
+            await queue.bind(self.exchange, routing_key)
+
+        pending: List[AbstractIncomingMessage] = []
+        flush_lock = asyncio.Lock()
+        timers: set = set()
+
+        async def flush() -> None:
+            async with flush_lock:
+                batch = pending[:]
+                pending.clear()
+                if not batch:
+                    return
+
+                parsed = []
+                for message in batch:
+                    try:
+                        event = self._parse_event(message)
+                    except Exception as e:
+                        logger.error(f"Dropping unparseable message: {e}")
+                        continue
+                    if event:
+                        parsed.append((message, event))
+
+                try:
+                    if parsed:
+                        await callback([event for _, event in parsed])
+                except Exception as e:
+                    logger.error(f"Error processing batch of {len(batch)} messages: {e}")
+                    if any(message.redelivered for message in batch):
+                        await self._process_one_by_one(batch, parsed, callback)
+                    else:
+                        await batch[-1].nack(multiple=True, requeue=True)
+                    return
+
+                await batch[-1].ack(multiple=True)
+                logger.info(f"Processed batch of {len(parsed)} events")
+
+        async def flush_later() -> None:
+            await asyncio.sleep(max_wait)
+            await flush()
+
+        async def message_handler(message: AbstractIncomingMessage) -> None:
+            pending.append(message)
+            if len(pending) >= max_batch_size:
+                await flush()
+            elif len(pending) == 1:
+                timer = asyncio.create_task(flush_later())
+                timers.add(timer)
+                timer.add_done_callback(timers.discard)
+
+        await queue.consume(message_handler)
+
+    async def _process_one_by_one(
+        self,
+        batch: Sequence[AbstractIncomingMessage],
+        parsed: Sequence[Tuple[AbstractIncomingMessage, DomainEvent]],
+        callback: Callable,
+    ) -> None:
+        """Settle a failed batch message by message; the ones that fail are rejected"""
+        events = {id(message): event for message, event in parsed}
+        for message in batch:
+            event = events.get(id(message))
+            if event is None:
+                await message.ack()
+                continue
+            try:
+                await callback([event])
+            except Exception as e:
+                logger.error(f"Rejecting {event.event_type} that failed after redelivery: {e}")
+                await message.reject(requeue=False)
+                continue
+            await message.ack()
+
+    def _parse_event(self, message: AbstractIncomingMessage) -> Optional[DomainEvent]:
+        event_data = json.loads(message.body.decode())
+        event_type = message.headers.get("event_type")
+
+        if event_type == "OrderCreated":
+            return OrderCreated(**event_data)
+        if event_type == "OrderCancelled":
+            return OrderCancelled(**event_data)
+        if event_type == "PaymentProcessed":
+            return PaymentProcessed(**event_data)
+        if event_type == "PaymentFailed":
+            return PaymentFailed(**event_data)
+        return None
+
     async def close(self) -> None:
         if self.connection:
             await self.connection.close()
@@ -1,16 +1,35 @@
-from typing import Optional
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterable, Container, Dict, List, Optional, Sequence, Set, Tuple
 from uuid import UUID
 
-from sqlalchemy import select, update
+from sqlalchemy import Integer, String, any_, column, func, insert, literal, select, table, text, update, values
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, distinct_on, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from domain.models import InventoryItem
-from .database import InventoryItem as InventoryModel
+from domain.models import (
+    AdjustmentRejected,
+    InsufficientStock,
+    InventoryItem,
+    ReservationExists,
+    ReservationHold,
+    ReservationStatus,
+    StockAdjustment,
+)
+from .database import (
+    InventoryAdjustment as AdjustmentModel,
+    InventoryItem as InventoryModel,
+    InventoryReservation as ReservationModel,
+)
+from .low_stock import LowStockWatcher
+
+StockLevel = Tuple[UUID, int, int]
 
 
 class InventoryRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, low_stock: Optional[LowStockWatcher] = None):
         self.session = session
+        self.low_stock = low_stock
 
     async def get_by_product_id(self, product_id: UUID) -> Optional[InventoryItem]:
         result = await self.session.execute(
@@ -19,46 +38,357 @@ class InventoryRepository:
         inventory_model = result.scalar_one_or_none()
         return self._to_domain(inventory_model) if inventory_model else None
 
+    async def get_many(self, product_ids: Sequence[UUID]) -> List[InventoryItem]:
+        """Fetch many products with one query; unknown product ids are skipped.
+
+        The ids are bound as a single array parameter (``= ANY(:ids)``) so the
+        statement text is the same whatever the number of ids.
+        """
+        if not product_ids:
+            return []
+        result = await self.session.execute(
+            select(InventoryModel).where(
+                InventoryModel.product_id == any_(
+                    literal(list(product_ids), ARRAY(PG_UUID(as_uuid=True)))
+                )
+            )
+        )
+        return [self._to_domain(model) for model in result.scalars().all()]
+
     async def create(self, inventory: InventoryItem) -> InventoryItem:
         inventory_model = InventoryModel(
             id=inventory.id,
             product_id=str(inventory.product_id),
             quantity=inventory.quantity_available,
             reserved_quantity=inventory.reserved_quantity,
+            reorder_threshold=inventory.reorder_threshold,
         )
         self.session.add(inventory_model)
         await self.session.commit()
         await self.session.refresh(inventory_model)
-        return self._to_domain(inventory_model)
+        created = self._to_domain(inventory_model)
+        if self.low_stock:
+            self.low_stock.observe_items([created])
+        return created
+
+    async def bulk_upsert(
+        self,
+        records: AsyncIterable[Tuple[UUID, int]],
+        skip: Container[UUID] = frozenset(),
+        chunk_size: int = 50_000,
+    ) -> Tuple[int, int]:
+        """Load (product_id, quantity_available) records with COPY and one upsert.
+
+        Records are streamed into a temporary staging table with asyncpg's
+        ``copy_records_to_table`` in chunks, then merged into inventory_items by
+        a single INSERT ... ON CONFLICT (product_id) DO UPDATE; the last record
+        wins for repeated products. Products in ``skip`` are left untouched.
+        Returns (upserted, skipped).
+        """
+        staged = skipped = 0
+        try:
+            # Through the session so the staging table lives in its transaction
+            await self.session.execute(text(
+                "CREATE TEMP TABLE inventory_import "
+                "(line bigint, product_id uuid, quantity integer) ON COMMIT DROP"
+            ))
+            connection = await self.session.connection()
+            driver = (await connection.get_raw_connection()).driver_connection
+
+            chunk = []
+            async for product_id, quantity in records:
+                if product_id in skip:
+                    skipped += 1
+                    continue
+                staged += 1
+                chunk.append((staged, product_id, quantity))
+                if len(chunk) >= chunk_size:
+                    await driver.copy_records_to_table("inventory_import", records=chunk)
+                    chunk = []
+            if chunk:
+                await driver.copy_records_to_table("inventory_import", records=chunk)
+
+            result = await self.session.execute(self._upsert_staged())
+            upserted = result.rowcount
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        await self.session.commit()
+        if self.low_stock:
+            await self.low_stock.load()
+        return upserted, skipped
 
     async def reserve_quantity(self, product_id: UUID, quantity: int) -> bool:
-        result = await self.session.execute(
-            select(InventoryModel).where(InventoryModel.product_id == product_id)
-        )
-        inventory_model = result.scalar_one_or_none()
-        
-        if not inventory_model or inventory_model.quantity < quantity:
+        try:
+            await self.reserve_order({product_id: quantity})
+        except InsufficientStock:
             return False
+        return True
 
-        await self.session.execute(
-            update(InventoryModel)
-            .where(InventoryModel.product_id == product_id)
-            .values(
-                quantity=InventoryModel.quantity - quantity,
-                reserved_quantity=InventoryModel.reserved_quantity + quantity
+    async def reserve_order(self, quantities: Dict[UUID, int], hold: Optional[ReservationHold] = None) -> None:
+        """Reserve every product of an order in one transaction, or none of them.
+
+        Raises InsufficientStock for the first product that cannot be covered,
+        or ReservationExists if ``hold`` was already recorded. ``hold`` may
+        cover more products than ``quantities`` when some of them are reserved
+        elsewhere (hot SKUs).
+        """
+        outcome = (await self.reserve_orders([(quantities, hold)]))[0]
+        if outcome is not None:
+            raise outcome
+
+    async def reserve_orders(
+        self, orders: Sequence[Tuple[Dict[UUID, int], Optional[ReservationHold]]]
+    ) -> List[Optional[Exception]]:
+        """Reserve many orders against one locked snapshot and commit them together.
+
+        The union of their rows is locked in product_id order, so concurrent
+        batches cannot deadlock. Orders are then evaluated in sequence against
+        the running availability; each is accepted whole or rejected whole. The
+        accepted totals are applied by one conditional UPDATE ... FROM (VALUES
+        ...) and their holds are inserted in the same transaction.
+
+        Returns one outcome per order: None when reserved, otherwise the
+        InsufficientStock or ReservationExists that rejected it.
+        """
+        try:
+            existing = await self._existing_holds(
+                [hold.order_id for _, hold in orders if hold is not None]
+            )
+            available = await self._lock_stock(sorted({p for quantities, _ in orders for p in quantities}))
+
+            outcomes: List[Optional[Exception]] = []
+            levels: List[StockLevel] = []
+            taken: Dict[UUID, int] = defaultdict(int)
+            holds: List[ReservationHold] = []
+            for quantities, hold in orders:
+                if hold is not None and hold.order_id in existing:
+                    outcomes.append(ReservationExists(hold.order_id))
+                    continue
+                shortfall = next(
+                    (p for p in sorted(quantities) if available.get(p, 0) < quantities[p]), None
+                )
+                if shortfall is not None:
+                    outcomes.append(InsufficientStock(
+                        shortfall, quantities[shortfall], available.get(shortfall, 0)
+                    ))
+                    continue
+
+                for product_id, quantity in quantities.items():
+                    available[product_id] -= quantity
+                    taken[product_id] += quantity
+                if hold is not None:
+                    existing.add(hold.order_id)
+                    holds.append(hold)
+                outcomes.append(None)
+
+            if taken:
+                levels = await self._take_stock(taken)
+            if holds:
+                await self.session.execute(
+                    insert(ReservationModel),
+                    [
+                        {
+                            "order_id": hold.order_id,
+                            "product_id": product_id,
+                            "quantity": quantity,
+                            "status": ReservationStatus.HELD.value,
+                            "expires_at": hold.expires_at,
+                        }
+                        for hold in holds
+                        for product_id, quantity in hold.quantities.items()
+                    ],
+                )
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        if taken or holds:
+            await self.session.commit()
+            self._observe(levels)
+        else:
+            # Nothing accepted; just release the row locks
+            await self.session.rollback()
+        return outcomes
+
+    async def apply_adjustments(self, adjustments: Sequence[StockAdjustment]) -> Tuple[List[InventoryItem], int]:
+        """Apply signed stock deltas atomically; returns (post-adjustment levels, duplicates).
+
+        Adjustments whose idempotency id was seen before are skipped. The rest
+        are summed per product and applied by one
+        ``UPDATE ... SET quantity = quantity + delta FROM unnest(...)``, so
+        concurrent reservations and restocks never lose an update. If any
+        product is unknown or would go below zero, nothing is applied and
+        AdjustmentRejected is raised.
+        """
+        try:
+            fresh = await self._fresh_adjustments(adjustments)
+            deltas: Dict[UUID, int] = defaultdict(int)
+            for adjustment in fresh:
+                deltas[adjustment.product_id] += adjustment.delta
+            product_ids = sorted(deltas)
+
+            levels: List[InventoryItem] = []
+            if product_ids:
+                # Lock in product_id order, as reservations do, so the two cannot deadlock
+                await self._lock_stock(product_ids)
+                changes = func.unnest(
+                    literal(product_ids, ARRAY(PG_UUID(as_uuid=True))),
+                    literal([deltas[product_id] for product_id in product_ids], ARRAY(Integer)),
+                ).table_valued("product_id", "delta").render_derived(name="changes")
+                result = await self.session.execute(
+                    update(InventoryModel)
+                    .where(InventoryModel.product_id == changes.c.product_id)
+                    .where(InventoryModel.quantity + changes.c.delta >= 0)
+                    .values(quantity=InventoryModel.quantity + changes.c.delta)
+                    .returning(InventoryModel)
+                    .execution_options(synchronize_session=False)
+                )
+                levels = [self._to_domain(model) for model in result.scalars().all()]
+                if len(levels) != len(product_ids):
+                    applied = {level.product_id for level in levels}
+                    raise AdjustmentRejected([p for p in product_ids if p not in applied])
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        await self.session.commit()
+        if self.low_stock:
+            self.low_stock.observe_items(levels)
+        return levels, len(adjustments) - len(fresh)
+
+    async def release_reservations(
+        self,
+        order_ids: Sequence[UUID],
+        expired_before: Optional[datetime] = None,
+        in_memory: Container[UUID] = frozenset(),
+    ) -> Dict[UUID, int]:
+        """Release the held reservations of many orders and return units per product.
+
+        Stock of products in ``in_memory`` is left for the caller to give back;
+        everything else is returned to ``inventory_items`` in the same transaction.
+        """
+        if not order_ids:
+            return {}
+
+        reservations = ReservationModel.__table__
+        query = (
+            update(reservations)
+            .where(reservations.c.order_id == any_(literal(list(order_ids), ARRAY(PG_UUID(as_uuid=True)))))
+            .where(reservations.c.status == ReservationStatus.HELD.value)
+            .values(status=ReservationStatus.RELEASED.value)
+            .returning(reservations.c.product_id, reservations.c.quantity)
+        )
+        if expired_before is not None:
+            query = query.where(reservations.c.expires_at <= expired_before)
+
+        released: Dict[UUID, int] = defaultdict(int)
+        for product_id, quantity in (await self.session.execute(query)).all():
+            released[product_id] += quantity
+
+        returned = sorted((p, q) for p, q in released.items() if p not in in_memory)
+        if returned:
+            items = InventoryModel.__table__
+            amounts = values(
+                column("product_id", PG_UUID(as_uuid=True)),
+                column("quantity", items.c.quantity.type),
+                name="released",
+            ).data(returned)
+            result = await self.session.execute(
+                update(items)
+                .where(items.c.product_id == amounts.c.product_id)
+                .values(
+                    quantity=items.c.quantity + amounts.c.quantity,
+                    reserved_quantity=items.c.reserved_quantity - amounts.c.quantity,
+                )
+                .returning(items.c.product_id, items.c.quantity, items.c.reorder_threshold)
             )
+            levels = result.all()
+        else:
+            levels = []
+        await self.session.commit()
+        self._observe(levels)
+        return dict(released)
+
+    async def commit_reservations(self, order_id: UUID) -> int:
+        """Mark an order's held reservations as sold so they never expire"""
+        reservations = ReservationModel.__table__
+        result = await self.session.execute(
+            update(reservations)
+            .where(reservations.c.order_id == order_id)
+            .where(reservations.c.status == ReservationStatus.HELD.value)
+            .values(status=ReservationStatus.COMMITTED.value)
         )
         await self.session.commit()
-        return True
+        return result.rowcount
+
+    async def released_reservations(self, order_id: UUID) -> Dict[UUID, int]:
+        """Units per product of an order's reservations that were already released"""
+        result = await self.session.execute(
+            select(ReservationModel.product_id, ReservationModel.quantity)
+            .where(ReservationModel.order_id == order_id)
+            .where(ReservationModel.status == ReservationStatus.RELEASED.value)
+        )
+        return dict(result.all())
+
+    async def recommit_reservations(self, order_id: UUID, quantities: Dict[UUID, int]) -> None:
+        """Take a released order's units again and mark its reservations as sold.
+
+        ``quantities`` are the units to take from ``inventory_items``; hot SKUs
+        of the order are left to the caller. Raises InsufficientStock if the
+        units were sold in the meantime, or ReservationExists if a concurrent
+        delivery already took them again.
+        """
+        reservations = ReservationModel.__table__
+        try:
+            result = await self.session.execute(
+                update(reservations)
+                .where(reservations.c.order_id == order_id)
+                .where(reservations.c.status == ReservationStatus.RELEASED.value)
+                .values(status=ReservationStatus.COMMITTED.value)
+            )
+            if result.rowcount == 0:
+                raise ReservationExists(order_id)
+
+            available = await self._lock_stock(sorted(quantities))
+            shortfall = next(
+                (p for p in sorted(quantities) if available.get(p, 0) < quantities[p]), None
+            )
+            if shortfall is not None:
+                raise InsufficientStock(shortfall, quantities[shortfall], available.get(shortfall, 0))
+            levels = await self._take_stock(quantities) if quantities else []
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        await self.session.commit()
+        self._observe(levels)
 
-    async def update_quantity(self, product_id: UUID, quantity_available: int) -> Optional[InventoryItem]:
+    async def held_reservation_deadlines(self) -> List[Tuple[UUID, datetime]]:
+        result = await self.session.execute(
+            select(ReservationModel.order_id, func.min(ReservationModel.expires_at))
+            .where(ReservationModel.status == ReservationStatus.HELD.value)
+            .group_by(ReservationModel.order_id)
+        )
+        return [(order_id, expires_at) for order_id, expires_at in result.all()]
+
+    async def update_quantity(
+        self, product_id: UUID, quantity_available: int, reorder_threshold: Optional[int] = None
+    ) -> Optional[InventoryItem]:
+        changes = {"quantity": quantity_available}
+        if reorder_threshold is not None:
+            changes["reorder_threshold"] = reorder_threshold
         await self.session.execute(
             update(InventoryModel)
             .where(InventoryModel.product_id == product_id)
-            .values(quantity=quantity_available)
+            .values(**changes)
         )
         await self.session.commit()
-        return await self.get_by_product_id(product_id)
+        inventory = await self.get_by_product_id(product_id)
+        if inventory and self.low_stock:
+            self.low_stock.observe_items([inventory])
+        return inventory
 
     def _to_domain(self, model: InventoryModel) -> InventoryItem:
         return InventoryItem(
@@ -66,6 +396,107 @@ class InventoryRepository:
             product_id=model.product_id,
             quantity_available=model.quantity,
             reserved_quantity=model.reserved_quantity,
+            reorder_threshold=model.reorder_threshold,
             created_at=model.created_at,
             updated_at=model.updated_at,
-        )
\ No newline at end of file
+        )
+
+    async def _fresh_adjustments(self, adjustments: Sequence[StockAdjustment]) -> List[StockAdjustment]:
+        """Record idempotency ids and drop adjustments that were applied before"""
+        keyed: Dict[str, StockAdjustment] = {}
+        for adjustment in adjustments:
+            if adjustment.idempotency_id is not None:
+                keyed.setdefault(adjustment.idempotency_id, adjustment)
+        if not keyed:
+            return list(adjustments)
+
+        records = func.unnest(
+            literal(list(keyed), ARRAY(String)),
+            literal([a.product_id for a in keyed.values()], ARRAY(PG_UUID(as_uuid=True))),
+            literal([a.delta for a in keyed.values()], ARRAY(Integer)),
+        ).table_valued("id", "product_id", "delta").render_derived(name="records")
+        result = await self.session.execute(
+            pg_insert(AdjustmentModel)
+            .from_select(["id", "product_id", "delta"], select(records.c.id, records.c.product_id, records.c.delta))
+            .on_conflict_do_nothing(index_elements=["id"])
+            .returning(AdjustmentModel.id)
+        )
+        new_ids = set(result.scalars().all())
+        return [
+            adjustment for adjustment in adjustments
+            if adjustment.idempotency_id is None
+            or (adjustment.idempotency_id in new_ids and keyed[adjustment.idempotency_id] is adjustment)
+        ]
+
+    async def _existing_holds(self, order_ids: List[UUID]) -> Set[UUID]:
+        if not order_ids:
+            return set()
+        result = await self.session.execute(
+            select(ReservationModel.order_id)
+            .where(ReservationModel.order_id == any_(literal(order_ids, ARRAY(PG_UUID(as_uuid=True)))))
+            .distinct()
+        )
+        return set(result.scalars().all())
+
+    async def _lock_stock(self, product_ids: List[UUID]) -> Dict[UUID, int]:
+        if not product_ids:
+            return {}
+        result = await self.session.execute(
+            select(InventoryModel.product_id, InventoryModel.quantity)
+            .where(InventoryModel.product_id.in_(product_ids))
+            .order_by(InventoryModel.product_id)
+            .with_for_update()
+        )
+        return dict(result.all())
+
+    async def _take_stock(self, quantities: Dict[UUID, int]) -> List[StockLevel]:
+        """Decrement locked rows that were already checked against ``quantities``"""
+        product_ids = sorted(quantities)
+        items = InventoryModel.__table__
+        requested = values(
+            column("product_id", PG_UUID(as_uuid=True)),
+            column("quantity", items.c.quantity.type),
+            name="requested",
+        ).data([(product_id, quantities[product_id]) for product_id in product_ids])
+
+        result = await self.session.execute(
+            update(items)
+            .where(items.c.product_id == requested.c.product_id)
+            .where(items.c.quantity >= requested.c.quantity)
+            .values(
+                quantity=items.c.quantity - requested.c.quantity,
+                reserved_quantity=items.c.reserved_quantity + requested.c.quantity,
+            )
+            .returning(items.c.product_id, items.c.quantity, items.c.reorder_threshold)
+        )
+        levels = result.all()
+        reserved = {product_id for product_id, _, _ in levels}
+        if len(reserved) != len(product_ids):
+            # Unreachable while the rows are locked, but never commit a partial reservation
+            missing = next(product_id for product_id in product_ids if product_id not in reserved)
+            raise InsufficientStock(missing, quantities[missing], 0)
+        return levels
+
+    def _observe(self, levels: Sequence[StockLevel]) -> None:
+        if self.low_stock:
+            for product_id, quantity, threshold in levels:
+                self.low_stock.observe(product_id, quantity, threshold)
+
+    def _upsert_staged(self):
+        items = InventoryModel.__table__
+        staging = table("inventory_import", column("line"), column("product_id"), column("quantity"))
+        latest = (
+            select(staging.c.product_id, staging.c.quantity)
+            .ext(distinct_on(staging.c.product_id))
+            .order_by(staging.c.product_id, staging.c.line.desc())
+            .subquery("latest")
+        )
+        now = func.timezone("utc", func.now())
+        statement = pg_insert(items).from_select(
+            ["id", "product_id", "quantity", "reserved_quantity", "created_at", "updated_at"],
+            select(func.gen_random_uuid(), latest.c.product_id, latest.c.quantity, literal(0), now, now),
+        )
+        return statement.on_conflict_do_update(
+            index_elements=[items.c.product_id],
+            set_={"quantity": statement.excluded.quantity, "updated_at": statement.excluded.updated_at},
+        )
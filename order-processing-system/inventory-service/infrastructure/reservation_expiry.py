@@ -0,0 +1,95 @@
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import sessionmaker
+
+from .database import AsyncSessionLocal
+from .repository import InventoryRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationExpiry:
+    """Min-heap of reservation deadlines that releases expired orders in batches.
+
+    Deadlines are pushed when an order is reserved and loaded from the
+    ``inventory_reservations`` partial index on startup, so expiry never scans
+    the table. Entries for orders that were paid or released in the meantime
+    are left in the heap; releasing them again is a no-op.
+    """
+
+    def __init__(
+        self,
+        session_maker: sessionmaker,
+        ttl: float = 900.0,
+        batch_size: int = 500,
+    ):
+        self.session_maker = session_maker
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self._heap: List[Tuple[datetime, UUID]] = []
+        self._wakeup = asyncio.Event()
+
+    def deadline(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.ttl)
+
+    def schedule(self, order_id: UUID, expires_at: datetime) -> None:
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (expires_at, order_id))
+        if earliest is None or expires_at < earliest:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._heap)
+
+    async def load(self) -> None:
+        async with self.session_maker() as session:
+            deadlines = await InventoryRepository(session).held_reservation_deadlines()
+        for order_id, expires_at in deadlines:
+            heapq.heappush(self._heap, (expires_at, order_id))
+        logger.info(f"Loaded {len(deadlines)} held reservations")
+
+    def pop_due(self, now: datetime) -> List[UUID]:
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    async def run(self, release: Callable[[List[UUID], datetime], Awaitable[None]]) -> None:
+        """Call ``release(order_ids, now)`` for each batch of expired orders"""
+        logger.info(f"Reservation expiry started (ttl {self.ttl}s)")
+        while True:
+            now = datetime.utcnow()
+            due = self.pop_due(now)
+            if due:
+                try:
+                    await release(due, now)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error releasing expired reservations: {e}")
+                    # Retry the batch on the next tick
+                    for order_id in due:
+                        heapq.heappush(self._heap, (now, order_id))
+                    await asyncio.sleep(1.0)
+                continue
+
+            timeout = (self._heap[0][0] - now).total_seconds() if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Global instance
+reservation_expiry = ReservationExpiry(
+    AsyncSessionLocal,
+    ttl=float(os.getenv("RESERVATION_TTL_SECONDS", "900")),
+    batch_size=int(os.getenv("RESERVATION_RELEASE_BATCH_SIZE", "500")),
+)
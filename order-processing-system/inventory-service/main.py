@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -7,9 +8,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.routes import router
 from application.inventory_service import InventoryService
-from infrastructure.database import get_db_session
+from infrastructure.cache import inventory_cache
+from infrastructure.database import engine, get_db_session
+from infrastructure.hot_stock import hot_stock
+from infrastructure.low_stock import low_stock
 from infrastructure.repository import InventoryRepository
 from infrastructure.message_queue import message_queue
+from infrastructure.reservation_expiry import reservation_expiry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,25 +24,67 @@ async def setup_event_listeners():
     """Setup event listeners for order events"""
     async def handle_order_events(event):
         async for session in get_db_session():
-            repository = InventoryRepository(session)
-            service = InventoryService(repository, message_queue)
+            repository = InventoryRepository(session, low_stock)
+            service = InventoryService(repository, message_queue, hot_stock, reservation_expiry, inventory_cache)
             
-            if event.event_type == "OrderCreated":
-                await service.handle_order_created(event)
+            if event.event_type == "OrderCancelled":
+                await service.handle_order_cancelled(event)
+            elif event.event_type == "PaymentProcessed":
+                await service.handle_payment_processed(event)
+            elif event.event_type == "PaymentFailed":
+                await service.handle_payment_failed(event)
             break
 
-    # Subscribe to order events
-    await message_queue.subscribe_to_events(
+    async def handle_created_orders(events):
+        async for session in get_db_session():
+            repository = InventoryRepository(session, low_stock)
+            service = InventoryService(repository, message_queue, hot_stock, reservation_expiry, inventory_cache)
+            await service.handle_orders_created(events)
+            break
+
+    # New orders are reserved in group-committed micro-batches
+    await message_queue.subscribe_batched(
         ["order.created"],
+        handle_created_orders,
+        max_batch_size=int(os.getenv("RESERVATION_BATCH_SIZE", "100")),
+        max_wait=int(os.getenv("RESERVATION_BATCH_MAX_WAIT_MS", "5")) / 1000,
+    )
+
+    # Subscribe to the outcomes that settle reservations
+    await message_queue.subscribe_to_events(
+        ["order.cancelled", "payment.processed", "payment.failed"],
         handle_order_events
     )
 
 
+async def release_expired_reservations(order_ids, now):
+    """Release callback for the reservation expiry scheduler"""
+    async for session in get_db_session():
+        repository = InventoryRepository(session, low_stock)
+        service = InventoryService(repository, message_queue, hot_stock, reservation_expiry, inventory_cache)
+        await service.release_reservations(order_ids, expired_before=now)
+        break
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Inventory Service...")
     await message_queue.connect()
+
+    # Before the hot ledger, which adds its in-memory levels on load
+    await low_stock.load()
+    low_stock_task = asyncio.create_task(
+        low_stock.run(lambda event: message_queue.publish_event(event, "inventory.low_stock"))
+    )
+
+    flush_task = None
+    if hot_stock.enabled:
+        await hot_stock.load()
+        flush_task = asyncio.create_task(hot_stock.run())
+
+    await reservation_expiry.load()
+    expiry_task = asyncio.create_task(reservation_expiry.run(release_expired_reservations))
     
     # Setup event listeners in background
     asyncio.create_task(setup_event_listeners())
@@ -46,7 +93,15 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Inventory Service...")
+    tasks = [task for task in (expiry_task, low_stock_task, flush_task) if task]
+    for task in tasks:
+        task.cancel()
+    # Let in-flight releases, announcements and flushes unwind before their resources go
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if flush_task:
+        await hot_stock.close()
     await message_queue.close()
+    await engine.dispose()
 
 
 app = FastAPI(
@@ -1,6 +1,11 @@
+import argparse
 import asyncio
-from uuid import UUID
+import random
+import time
+from typing import AsyncIterator
+from uuid import NAMESPACE_URL, UUID, uuid5
 
+from infrastructure.bulk_import import InventoryRecord
 from infrastructure.database import get_db_session
 from infrastructure.repository import InventoryRepository
 from domain.models import InventoryItem
@@ -31,5 +36,26 @@ async def seed_data():
             else:
                  print(f"Seeding failed (ignorable if duplication): {e}")
 
+async def synthetic_records(count: int) -> AsyncIterator[InventoryRecord]:
+    """Deterministic product ids, so re-seeding the same count upserts the same SKUs"""
+    for i in range(count):
+        yield (uuid5(NAMESPACE_URL, f"sku-{i}"), random.randint(0, 1000))
+
+
+async def seed_synthetic(count: int):
+    async for session in get_db_session():
+        repo = InventoryRepository(session)
+        started = time.perf_counter()
+        imported, _ = await repo.bulk_upsert(synthetic_records(count))
+        elapsed = time.perf_counter() - started
+        print(f"Seeded {imported} synthetic SKUs in {elapsed:.1f}s ({imported / elapsed:,.0f} rows/s)")
+        break
+
 if __name__ == "__main__":
-    asyncio.run(seed_data())
+    parser = argparse.ArgumentParser(description="Seed inventory data")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="generate N synthetic SKUs for load tests")
+    args = parser.parse_args()
+    if args.synthetic:
+        asyncio.run(seed_synthetic(args.synthetic))
+    else:
+        asyncio.run(seed_data())
@@ -1,9 +1,25 @@
+import asyncio
 import pytest
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
+from datetime import datetime, timedelta
 from uuid import uuid4
-from domain.events import OrderCreated, OrderItem
-from domain.models import InventoryItem
+from domain.events import InventoryOversold, OrderCreated, OrderItem, PaymentFailed, PaymentProcessed
+from domain.models import (
+    AdjustmentRejected,
+    InsufficientStock,
+    InventoryItem,
+    ReservationExists,
+    ReservationHold,
+    StockAdjustment,
+)
 from application.inventory_service import InventoryService
+from infrastructure.cache import TTLCache
+from infrastructure.bulk_import import CSV, NDJSON, from_iterable, parse_records
+from infrastructure.hot_stock import HotStockLedger
+from infrastructure.low_stock import LowStockWatcher
+from infrastructure.message_queue import MessageQueue
+from infrastructure.repository import InventoryRepository
+from infrastructure.reservation_expiry import ReservationExpiry
 
 @pytest.mark.asyncio
 async def test_get_inventory():
@@ -42,17 +58,10 @@ async def test_handle_order_created_reserve_success():
         total_amount=20.0
     )
     
-    mock_repo.get_by_product_id.return_value = InventoryItem(
-        product_id=product_id,
-        quantity_available=5,
-        reserved_quantity=0,
-        id=uuid4()
-    )
-    mock_repo.reserve_quantity.return_value = True
-
     await service.handle_order_created(event)
 
-    mock_repo.reserve_quantity.assert_called_once_with(product_id, quantity)
+    mock_repo.reserve_order.assert_called_once_with({product_id: quantity}, None)
+    mock_repo.get_by_product_id.assert_not_called()
     mock_queue.publish_event.assert_called()
 
 @pytest.mark.asyncio
@@ -72,14 +81,612 @@ async def test_handle_order_created_insufficient_stock():
         total_amount=1000.0
     )
     
-    mock_repo.get_by_product_id.return_value = InventoryItem(
-        product_id=product_id,
-        quantity_available=10,
-        reserved_quantity=0,
-        id=uuid4()
+    mock_repo.reserve_order.side_effect = InsufficientStock(product_id, quantity, 10)
+
+    await service.handle_order_created(event)
+
+    unavailable, routing_key = mock_queue.publish_event.call_args.args
+    assert routing_key == "inventory.unavailable"
+    assert unavailable.available_quantity == 10
+    mock_queue.publish_event.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_handle_order_created_merges_duplicate_lines():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    service = InventoryService(mock_repo, mock_queue)
+
+    product_id = uuid4()
+    event = OrderCreated(
+        order_id=uuid4(),
+        customer_id=uuid4(),
+        items=[
+            OrderItem(product_id=product_id, quantity=2, price=10.0),
+            OrderItem(product_id=product_id, quantity=3, price=10.0),
+        ],
+        total_amount=50.0
     )
 
     await service.handle_order_created(event)
 
-    mock_repo.reserve_quantity.assert_not_called()
-    mock_queue.publish_event.assert_called()
+    mock_repo.reserve_order.assert_called_once_with({product_id: 5}, None)
+    mock_queue.publish_event.assert_called_once()
+    reserved, routing_key = mock_queue.publish_event.call_args.args
+    assert routing_key == "inventory.reserved"
+    assert len(reserved.items) == 2
+    assert reserved.total_amount == 50.0
+
+@pytest.mark.asyncio
+async def test_reserve_order_is_all_or_nothing():
+    session = AsyncMock()
+    enough, short = sorted([uuid4(), uuid4()])
+    locked = MagicMock()
+    locked.all.return_value = [(enough, 10), (short, 1)]
+    session.execute.return_value = locked
+    repository = InventoryRepository(session)
+
+    with pytest.raises(InsufficientStock) as excinfo:
+        await repository.reserve_order({short: 2, enough: 2})
+
+    assert excinfo.value.product_id == short
+    # Only the locking SELECT ran; nothing was decremented
+    session.execute.assert_called_once()
+    session.rollback.assert_called_once()
+    session.commit.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_inventories_deduplicates_ids():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    service = InventoryService(mock_repo, mock_queue)
+    first, second = uuid4(), uuid4()
+
+    await service.get_inventories([first, second, first])
+
+    mock_repo.get_many.assert_called_once_with([first, second])
+
+@pytest.mark.asyncio
+async def test_get_many_binds_ids_as_one_array():
+    session = AsyncMock()
+    session.execute.return_value = MagicMock()
+    repository = InventoryRepository(session)
+
+    await repository.get_many([uuid4(), uuid4(), uuid4()])
+
+    statement = session.execute.call_args.args[0]
+    assert "= ANY (" in str(statement)
+    assert len(statement.compile().params) == 1
+
+@pytest.mark.asyncio
+async def test_hot_stock_reserves_in_memory_and_replays_journal(tmp_path):
+    journal = str(tmp_path / "hot_stock.journal")
+    hot_id = uuid4()
+    ledger = HotStockLedger(MagicMock(), [hot_id], journal)
+    ledger.restore({hot_id: 5}, flushed_seq=0)
+
+    await ledger.reserve({hot_id: 3})
+    with pytest.raises(InsufficientStock):
+        await ledger.reserve({hot_id: 3})
+
+    # A restarted instance sees the journaled reservation until it is flushed
+    recovered = HotStockLedger(MagicMock(), [hot_id], journal)
+    recovered.restore({hot_id: 5}, flushed_seq=0)
+    assert recovered.overlay(InventoryItem(product_id=hot_id, quantity_available=5)).quantity_available == 2
+
+    recovered.restore({hot_id: 2}, flushed_seq=1)
+    assert recovered.overlay(InventoryItem(product_id=hot_id, quantity_available=2)).quantity_available == 2
+
+@pytest.mark.asyncio
+async def test_hot_stock_reservation_is_fsynced_before_it_returns(tmp_path, monkeypatch):
+    hot_id = uuid4()
+    ledger = HotStockLedger(MagicMock(), [hot_id], str(tmp_path / "hot_stock.journal"))
+    ledger.restore({hot_id: 5}, flushed_seq=0)
+    synced = []
+    monkeypatch.setattr("infrastructure.hot_stock.os.fsync", synced.append)
+
+    await ledger.reserve({hot_id: 1})
+
+    assert synced == [ledger._journal_file.fileno()]
+
+@pytest.mark.asyncio
+async def test_hot_stock_order_with_regular_item_is_all_or_nothing(tmp_path):
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    hot_id, cold_id = uuid4(), uuid4()
+    ledger = HotStockLedger(MagicMock(), [hot_id], str(tmp_path / "hot_stock.journal"))
+    ledger.restore({hot_id: 5}, flushed_seq=0)
+    service = InventoryService(mock_repo, mock_queue, ledger)
+    mock_repo.reserve_order.side_effect = InsufficientStock(cold_id, 1, 0)
+
+    event = OrderCreated(
+        order_id=uuid4(),
+        customer_id=uuid4(),
+        items=[
+            OrderItem(product_id=hot_id, quantity=2, price=10.0),
+            OrderItem(product_id=cold_id, quantity=1, price=10.0),
+        ],
+        total_amount=30.0
+    )
+
+    await service.handle_order_created(event)
+
+    mock_repo.reserve_order.assert_called_once_with({cold_id: 1}, None)
+    assert ledger.overlay(InventoryItem(product_id=hot_id, quantity_available=5)).quantity_available == 5
+    assert mock_queue.publish_event.call_args.args[1] == "inventory.unavailable"
+
+@pytest.mark.asyncio
+async def test_reservation_is_held_and_scheduled_for_expiry():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    expiry = ReservationExpiry(MagicMock(), ttl=60)
+    service = InventoryService(mock_repo, mock_queue, expiry=expiry)
+    product_id = uuid4()
+    event = OrderCreated(
+        order_id=uuid4(),
+        customer_id=uuid4(),
+        items=[OrderItem(product_id=product_id, quantity=2, price=10.0)],
+        total_amount=20.0
+    )
+
+    await service.handle_order_created(event)
+
+    hold = mock_repo.reserve_order.call_args.args[1]
+    assert hold.order_id == event.order_id
+    assert hold.quantities == {product_id: 2}
+    assert expiry.pop_due(datetime.utcnow()) == []
+    assert expiry.pop_due(hold.expires_at) == [event.order_id]
+
+@pytest.mark.asyncio
+async def test_payment_failed_releases_hot_units_in_memory(tmp_path):
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    hot_id, cold_id = uuid4(), uuid4()
+    ledger = HotStockLedger(MagicMock(), [hot_id], str(tmp_path / "hot_stock.journal"))
+    ledger.restore({hot_id: 3}, flushed_seq=0)
+    service = InventoryService(mock_repo, mock_queue, ledger)
+    mock_repo.release_reservations.return_value = {hot_id: 2, cold_id: 1}
+    order_id = uuid4()
+
+    await service.handle_payment_failed(PaymentFailed(order_id=order_id, payment_id=uuid4(), reason="declined"))
+
+    assert mock_repo.release_reservations.call_args.args[0] == [order_id]
+    assert hot_id in mock_repo.release_reservations.call_args.args[2]
+    assert ledger.overlay(InventoryItem(product_id=hot_id, quantity_available=3)).quantity_available == 5
+
+@pytest.mark.asyncio
+async def test_payment_after_expired_hold_takes_stock_again_or_alerts():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    service = InventoryService(mock_repo, mock_queue)
+    product_id = uuid4()
+    event = PaymentProcessed(order_id=uuid4(), payment_id=uuid4(), amount=10.0)
+    mock_repo.commit_reservations.return_value = 0
+    mock_repo.released_reservations.return_value = {product_id: 2}
+
+    await service.handle_payment_processed(event)
+
+    mock_repo.recommit_reservations.assert_called_once_with(event.order_id, {product_id: 2})
+    mock_queue.publish_event.assert_not_called()
+
+    # The released units were sold to someone else in the meantime
+    mock_repo.recommit_reservations.side_effect = InsufficientStock(product_id, 2, 1)
+
+    await service.handle_payment_processed(event)
+
+    alert, routing_key = mock_queue.publish_event.call_args.args
+    assert routing_key == "inventory.oversold"
+    assert isinstance(alert, InventoryOversold)
+    assert (alert.product_id, alert.requested_quantity, alert.available_quantity) == (product_id, 2, 1)
+
+@pytest.mark.asyncio
+async def test_hot_order_in_batch_surfaces_publish_errors(tmp_path):
+    hot_id = uuid4()
+    ledger = HotStockLedger(MagicMock(), [hot_id], str(tmp_path / "hot_stock.journal"))
+    ledger.restore({hot_id: 5}, flushed_seq=0)
+    mock_queue = AsyncMock()
+    mock_queue.publish_event.side_effect = ConnectionError("broker down")
+    service = InventoryService(AsyncMock(), mock_queue, hot_stock=ledger)
+    event = OrderCreated(
+        order_id=uuid4(),
+        customer_id=uuid4(),
+        items=[OrderItem(product_id=hot_id, quantity=1, price=10.0)],
+        total_amount=10.0
+    )
+
+    # Not swallowed, so the batch is requeued instead of acked
+    with pytest.raises(ConnectionError):
+        await service.handle_orders_created([event])
+
+def test_expiry_pops_due_orders_in_deadline_order():
+    expiry = ReservationExpiry(MagicMock(), batch_size=2)
+    now = datetime.utcnow()
+    first, second, third, later = uuid4(), uuid4(), uuid4(), uuid4()
+    expiry.schedule(second, now - timedelta(seconds=1))
+    expiry.schedule(later, now + timedelta(minutes=5))
+    expiry.schedule(first, now - timedelta(seconds=2))
+    expiry.schedule(third, now)
+
+    assert expiry.pop_due(now) == [first, second]
+    assert expiry.pop_due(now) == [third]
+    assert expiry.pending() == 1
+
+@pytest.mark.asyncio
+async def test_parse_records_reads_csv_and_ndjson():
+    product_id = uuid4()
+    csv_lines = ["product_id,quantity_available", f"{product_id},7", ""]
+    ndjson_lines = [f'{{"product_id": "{product_id}", "quantity_available": 3}}']
+
+    assert [r async for r in parse_records(from_iterable(csv_lines), CSV)] == [(product_id, 7)]
+    assert [r async for r in parse_records(from_iterable(ndjson_lines), NDJSON)] == [(product_id, 3)]
+    with pytest.raises(ValueError, match="line 2"):
+        [r async for r in parse_records(from_iterable(csv_lines[:1] + [f"{product_id},-1"]), CSV)]
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_copies_in_chunks_and_skips_hot_skus():
+    session = AsyncMock()
+    driver = AsyncMock()
+    connection = AsyncMock()
+    connection.get_raw_connection.return_value = MagicMock(driver_connection=driver)
+    session.connection.return_value = connection
+    session.execute.return_value = MagicMock(rowcount=3)
+    repository = InventoryRepository(session)
+    hot_id = uuid4()
+    records = [(uuid4(), 1), (hot_id, 2), (uuid4(), 3), (uuid4(), 4)]
+
+    async def stream():
+        for record in records:
+            yield record
+
+    assert await repository.bulk_upsert(stream(), skip={hot_id}, chunk_size=2) == (3, 1)
+
+    copied = [call.kwargs["records"] for call in driver.copy_records_to_table.call_args_list]
+    assert [len(chunk) for chunk in copied] == [2, 1]
+    assert all(row[1] != hot_id for chunk in copied for row in chunk)
+    # One CREATE TEMP TABLE and one INSERT ... ON CONFLICT
+    assert session.execute.call_count == 2
+    session.commit.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_cache_coalesces_concurrent_misses():
+    cache = TTLCache(ttl=10.0)
+    loads = 0
+
+    async def load():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return b"{}"
+
+    results = await asyncio.gather(*(cache.get_or_load("sku", load) for _ in range(10)))
+
+    assert results == [b"{}"] * 10
+    assert loads == 1
+    assert cache.stats()["coalesced"] == 9
+    assert await cache.get_or_load("sku", load) == b"{}"
+    assert cache.hits == 1
+
+def test_cache_tombstones_do_not_evict_live_entries():
+    now = [0.0]
+    cache = TTLCache(max_size=2, ttl=10.0, clock=lambda: now[0])
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    for key in range(100):
+        cache.invalidate(key)
+
+    assert cache.get("a") == b"1" and cache.get("b") == b"2"
+    assert cache.evictions == 0
+    assert cache.stats()["tombstones"] == 100
+
+    now[0] = 11.0
+    cache.invalidate("c")
+    assert cache.stats()["tombstones"] == 1
+
+@pytest.mark.asyncio
+async def test_reservation_invalidates_cached_availability():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    now = [0.0]
+    cache = TTLCache(ttl=10.0, clock=lambda: now[0])
+    service = InventoryService(mock_repo, mock_queue, cache=cache)
+    product_id = uuid4()
+    mock_repo.get_by_product_id.return_value = InventoryItem(product_id=product_id, quantity_available=5)
+
+    await service.get_inventory_json(product_id)
+    await service.get_inventory_json(product_id)
+    now[0] = 1.0
+    await service.handle_order_created(OrderCreated(
+        order_id=uuid4(),
+        customer_id=uuid4(),
+        items=[OrderItem(product_id=product_id, quantity=1, price=10.0)],
+        total_amount=10.0
+    ))
+    now[0] = 2.0
+    await service.get_inventory_json(product_id)
+
+    assert mock_repo.get_by_product_id.call_count == 2
+    assert cache.stats()["invalidations"] == 1
+
+@pytest.mark.asyncio
+async def test_reserve_orders_evaluates_batch_against_one_snapshot():
+    session = AsyncMock()
+    product_id = uuid4()
+    redelivered = uuid4()
+    existing = MagicMock()
+    existing.scalars.return_value.all.return_value = [redelivered]
+    locked = MagicMock()
+    locked.all.return_value = [(product_id, 5)]
+    updated = MagicMock()
+    updated.all.return_value = [(product_id, 0, 0)]
+    session.execute.side_effect = [existing, locked, updated, MagicMock()]
+    repository = InventoryRepository(session)
+    expires_at = datetime.utcnow()
+
+    def order(quantity, order_id=None):
+        hold = ReservationHold(order_id=order_id or uuid4(), quantities={product_id: quantity}, expires_at=expires_at)
+        return {product_id: quantity}, hold
+
+    outcomes = await repository.reserve_orders([order(3), order(3), order(2), order(1, redelivered)])
+
+    assert outcomes[0] is None
+    assert isinstance(outcomes[1], InsufficientStock)
+    assert outcomes[1].available_quantity == 2
+    assert outcomes[2] is None
+    assert isinstance(outcomes[3], ReservationExists)
+    # Existing holds, lock, one UPDATE for the accepted total, one INSERT of holds
+    assert session.execute.call_count == 4
+    assert len(session.execute.call_args.args[1]) == 2
+    session.commit.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_handle_orders_created_publishes_each_outcome_once():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    service = InventoryService(mock_repo, mock_queue)
+    events = [
+        OrderCreated(
+            order_id=uuid4(),
+            customer_id=uuid4(),
+            items=[OrderItem(product_id=uuid4(), quantity=1, price=10.0)],
+            total_amount=10.0
+        )
+        for _ in range(2)
+    ]
+    short = events[1].items[0].product_id
+    mock_repo.reserve_orders.return_value = [None, InsufficientStock(short, 1, 0)]
+
+    await service.handle_orders_created(events)
+
+    mock_repo.reserve_orders.assert_called_once()
+    mock_repo.reserve_order.assert_not_called()
+    messages = mock_queue.publish_events.call_args.args[0]
+    assert [routing_key for _, routing_key in messages] == ["inventory.reserved", "inventory.unavailable"]
+
+@pytest.mark.asyncio
+async def test_redelivered_batch_announces_committed_orders_and_surfaces_publish_errors():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    service = InventoryService(mock_repo, mock_queue)
+    event = OrderCreated(
+        order_id=uuid4(),
+        customer_id=uuid4(),
+        items=[OrderItem(product_id=uuid4(), quantity=1, price=10.0)],
+        total_amount=10.0
+    )
+    # The first delivery committed the reservation but never published
+    mock_repo.reserve_orders.return_value = [ReservationExists(event.order_id)]
+    mock_queue.publish_events.side_effect = ConnectionError("broker down")
+
+    with pytest.raises(ConnectionError):
+        await service.handle_orders_created([event])
+
+    messages = mock_queue.publish_events.call_args.args[0]
+    assert [(e.order_id, routing_key) for e, routing_key in messages] == [(event.order_id, "inventory.reserved")]
+
+
+@pytest.mark.asyncio
+async def test_apply_adjustments_skips_replayed_idempotency_ids():
+    session = AsyncMock()
+    product_id = uuid4()
+    recorded = MagicMock()
+    recorded.scalars.return_value.all.return_value = ["restock-2"]
+    updated = MagicMock()
+    updated.scalars.return_value.all.return_value = [MagicMock(
+        id=uuid4(), product_id=product_id, quantity=15, reserved_quantity=0,
+        created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+    )]
+    locked = MagicMock()
+    locked.all.return_value = [(product_id, 10)]
+    session.execute.side_effect = [recorded, locked, updated]
+    repository = InventoryRepository(session)
+    adjustments = [
+        StockAdjustment(product_id=product_id, delta=5, idempotency_id="restock-1"),
+        StockAdjustment(product_id=product_id, delta=5, idempotency_id="restock-2"),
+        StockAdjustment(product_id=product_id, delta=-2),
+    ]
+
+    levels, duplicates = await repository.apply_adjustments(adjustments)
+
+    assert duplicates == 1
+    assert levels[0].quantity_available == 15
+    # Rows are locked in product_id order before the bulk UPDATE
+    lock_statement = str(session.execute.call_args_list[1].args[0])
+    assert "ORDER BY inventory_items.product_id" in lock_statement and "FOR UPDATE" in lock_statement
+    update_statement = session.execute.call_args_list[2].args[0]
+    assert "unnest" in str(update_statement)
+    # restock-2 and the un-keyed -2 are summed into one delta
+    assert [3] in update_statement.compile().params.values()
+    session.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_apply_adjustments_rejects_whole_batch_on_negative_stock():
+    session = AsyncMock()
+    updated = MagicMock()
+    updated.scalars.return_value.all.return_value = []
+    session.execute.return_value = updated
+    repository = InventoryRepository(session)
+    product_id = uuid4()
+
+    with pytest.raises(AdjustmentRejected) as rejected:
+        await repository.apply_adjustments([StockAdjustment(product_id=product_id, delta=-50)])
+
+    assert rejected.value.product_ids == [product_id]
+    session.rollback.assert_called_once()
+    session.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_adjust_inventory_writes_hot_skus_through_and_invalidates_cache(tmp_path):
+    hot_id, cold_id = uuid4(), uuid4()
+    ledger = HotStockLedger(AsyncMock(), [hot_id], journal_path=str(tmp_path / "journal"))
+    ledger.restore({hot_id: 10}, 0)
+    ledger._write_deltas = AsyncMock()
+    cache = TTLCache()
+    cache.set(cold_id, b"stale")
+    levels = [
+        InventoryItem(product_id=hot_id, quantity_available=25),
+        InventoryItem(product_id=cold_id, quantity_available=3),
+    ]
+    mock_repo = AsyncMock()
+    mock_repo.apply_adjustments.return_value = (levels, 0)
+    service = InventoryService(mock_repo, AsyncMock(), hot_stock=ledger, cache=cache)
+
+    await ledger.reserve({hot_id: 2})
+    await service.adjust_inventory([
+        StockAdjustment(product_id=hot_id, delta=17),
+        StockAdjustment(product_id=cold_id, delta=-1),
+    ])
+
+    ledger._write_deltas.assert_called_once()
+    assert ledger._available[hot_id] == 25
+    assert cache.get(cold_id) is None
+
+
+def test_low_stock_watcher_announces_each_crossing_once():
+    watcher = LowStockWatcher(MagicMock())
+    product_id = uuid4()
+
+    watcher.observe(product_id, 12, 10)
+    watcher.observe(product_id, 9, 10)
+    watcher.observe(product_id, 4, 10)
+    assert [item.quantity_available for item in watcher.low_stock()] == [4]
+    assert watcher.pending() == 1
+
+    watcher.observe(product_id, 40, 10)
+    assert watcher.low_stock() == []
+    watcher.observe(product_id, 0, 10)
+    assert watcher.pending() == 2
+
+
+@pytest.mark.asyncio
+async def test_low_stock_load_announces_skus_without_recorded_announcement():
+    session = AsyncMock()
+    session_maker = MagicMock()
+    session_maker.return_value.__aenter__.return_value = session
+    watcher = LowStockWatcher(session_maker)
+    unannounced, announced = uuid4(), uuid4()
+    rows = MagicMock()
+    rows.all.return_value = [(unannounced, 0, 5, None), (announced, 1, 5, datetime.utcnow())]
+    claimed = MagicMock()
+    claimed.scalar_one_or_none.return_value = unannounced
+    session.execute.side_effect = [MagicMock(), rows, claimed]
+
+    await watcher.load()
+    assert {item.product_id for item in watcher.low_stock()} == {unannounced, announced}
+    assert watcher.pending() == 1
+
+    publish = AsyncMock()
+    task = asyncio.create_task(watcher.run(publish))
+    while not publish.called:
+        await asyncio.sleep(0)
+    task.cancel()
+
+    assert publish.call_args.args[0].product_id == unannounced
+    # Only an instance that records the announcement first publishes it
+    claim = str(session.execute.call_args_list[2].args[0].compile())
+    assert "low_stock_announced_at IS NULL" in claim
+
+
+@pytest.mark.asyncio
+async def test_reservations_feed_low_stock_watcher(tmp_path):
+    watcher = LowStockWatcher(MagicMock())
+    hot_id, cold_id = uuid4(), uuid4()
+    ledger = HotStockLedger(AsyncMock(), [hot_id], journal_path=str(tmp_path / "journal"), low_stock=watcher)
+    ledger.restore({hot_id: 5}, 0)
+    watcher.pin({hot_id: 2})
+    session = AsyncMock()
+    locked = MagicMock()
+    locked.all.return_value = [(cold_id, 8)]
+    updated = MagicMock()
+    updated.all.return_value = [(cold_id, 0, 0)]
+    session.execute.side_effect = [locked, updated]
+    repository = InventoryRepository(session, watcher)
+
+    await ledger.reserve({hot_id: 3})
+    await repository.reserve_order({cold_id: 8})
+
+    assert {item.product_id for item in watcher.low_stock()} == {hot_id, cold_id}
+    await ledger.release({hot_id: 3})
+    assert [item.product_id for item in watcher.low_stock()] == [cold_id]
+
+
+@pytest.mark.asyncio
+async def test_batched_consumer_acks_on_its_own_channel():
+    queue = MessageQueue()
+    queue.connection = AsyncMock()
+    queue.channel = AsyncMock()
+    batch_channel = AsyncMock()
+    queue.connection.channel.return_value = batch_channel
+
+    await queue.subscribe_batched(["order.created"], AsyncMock())
+
+    # A multiple-ack must not reach deliveries of the shared channel's consumers
+    batch_channel.declare_queue.assert_called_once()
+    batch_channel.set_qos.assert_called_once()
+    queue.channel.declare_queue.assert_not_called()
+    queue.channel.set_qos.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_failing_redelivered_batch_rejects_only_the_poison_order():
+    queue = MessageQueue()
+    queue.connection = AsyncMock()
+    queue.channel = AsyncMock()
+    good, poison = (
+        OrderCreated(
+            order_id=uuid4(),
+            customer_id=uuid4(),
+            items=[OrderItem(product_id=uuid4(), quantity=1, price=10.0)],
+            total_amount=10.0
+        )
+        for _ in range(2)
+    )
+
+    async def callback(events):
+        if any(event.order_id == poison.order_id for event in events):
+            raise ValueError("cannot reserve")
+
+    queue.connection.channel.return_value = AsyncMock()
+    amqp_queue = queue.connection.channel.return_value.declare_queue.return_value
+    await queue.subscribe_batched(["order.created"], callback, max_batch_size=2)
+    handler = amqp_queue.consume.call_args.args[0]
+
+    messages = []
+    for event in (good, poison):
+        message = AsyncMock()
+        message.body = event.model_dump_json().encode()
+        message.headers = {"event_type": event.event_type}
+        message.redelivered = False
+        messages.append(message)
+
+    # First delivery: the whole batch goes back to the queue
+    for message in messages:
+        await handler(message)
+    messages[-1].nack.assert_called_once_with(multiple=True, requeue=True)
+
+    # Redelivered: settled one by one, only the poison message is dropped
+    for message in messages:
+        message.redelivered = True
+        await handler(message)
+    messages[0].ack.assert_called_once_with()
+    messages[1].reject.assert_called_once_with(requeue=False)
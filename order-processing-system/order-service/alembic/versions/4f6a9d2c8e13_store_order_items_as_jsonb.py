@@ -0,0 +1,49 @@
+"""store order items as jsonb
+
+Revision ID: 4f6a9d2c8e13
+Revises: d81c4e07a2b5
+Create Date: 2026-10-17 11:26:40.552310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4f6a9d2c8e13'
+down_revision = 'd81c4e07a2b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The USING cast backfills every existing row from its JSON text
+    op.alter_column(
+        'orders',
+        'items',
+        existing_type=sa.Text(),
+        type_=postgresql.JSONB(astext_type=sa.Text()),
+        existing_nullable=False,
+        postgresql_using='items::jsonb',
+    )
+    op.create_index(
+        'ix_orders_items',
+        'orders',
+        ['items'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'items': 'jsonb_path_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_items', table_name='orders', postgresql_using='gin')
+    op.alter_column(
+        'orders',
+        'items',
+        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+        type_=sa.Text(),
+        existing_nullable=False,
+        postgresql_using='items::text',
+    )
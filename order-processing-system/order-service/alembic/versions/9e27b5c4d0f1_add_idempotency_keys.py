@@ -0,0 +1,32 @@
+"""add idempotency keys
+
+Revision ID: 9e27b5c4d0f1
+Revises: 4f6a9d2c8e13
+Create Date: 2026-10-17 14:41:07.283519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e27b5c4d0f1'
+down_revision = '4f6a9d2c8e13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('idempotency_keys',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('request_hash', sa.String(length=64), nullable=False),
+    sa.Column('order_id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_idempotency_keys_created_at'), 'idempotency_keys', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_idempotency_keys_created_at'), table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,33 @@
+"""add outbox
+
+Revision ID: b3e2f1a9c7d4
+Revises: 5c1164b3db97
+Create Date: 2026-10-17 09:12:31.406218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e2f1a9c7d4'
+down_revision = '5c1164b3db97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('outbox',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('event_type', sa.String(), nullable=False),
+    sa.Column('routing_key', sa.String(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbox_created_at'), 'outbox', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_outbox_created_at'), table_name='outbox')
+    op.drop_table('outbox')
@@ -0,0 +1,29 @@
+"""add orders customer keyset index
+
+Revision ID: d81c4e07a2b5
+Revises: b3e2f1a9c7d4
+Create Date: 2026-10-17 10:03:54.118907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81c4e07a2b5'
+down_revision = 'b3e2f1a9c7d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_orders_customer_id_created_at_id',
+        'orders',
+        ['customer_id', 'created_at', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_customer_id_created_at_id', table_name='orders')
@@ -1,38 +1,69 @@
-from typing import List
+import asyncio
+import base64
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from api.responses import PydanticJSONResponse
 from application.order_service import OrderService
-from domain.models import CreateOrderRequest, OrderResponse
-from infrastructure.database import get_db_session
+from domain.models import (
+    CreateOrderRequest,
+    CreateOrdersBatchRequest,
+    IdempotencyKeyMismatch,
+    InvalidStatusTransition,
+    Order,
+    OrderResponse,
+    OrderStatus,
+    is_terminal,
+)
+from infrastructure.cache import idempotency_cache, order_cache
+from infrastructure.database import async_session_maker, get_db_session
+from infrastructure.outbox import outbox_relay
 from infrastructure.repository import OrderRepository
-from infrastructure.message_queue import message_queue
+from infrastructure.status_hub import status_hub
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+KEEPALIVE_SECONDS = 15
+
 
 async def get_order_service(session: AsyncSession = Depends(get_db_session)) -> OrderService:
     repository = OrderRepository(session)
-    return OrderService(repository, message_queue)
+    return OrderService(repository, outbox_relay, order_cache, idempotency_cache, status_hub)
+
+
+@router.get("/_cache")
+async def get_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the order read cache"""
+    return order_cache.stats()
 
 
 @router.post("", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     request: CreateOrderRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     service: OrderService = Depends(get_order_service)
-) -> OrderResponse:
+) -> PydanticJSONResponse:
     try:
-        order = await service.create_order(request)
-        return OrderResponse(
-            id=order.id,
-            customer_id=order.customer_id,
-            items=order.items,
-            total_amount=order.total_amount,
-            status=order.status,
-            created_at=order.created_at,
-            updated_at=order.updated_at,
+        if idempotency_key:
+            replayed = await service.replay_create_order(idempotency_key, request)
+            if replayed is not None:
+                return PydanticJSONResponse(
+                    replayed,
+                    status_code=status.HTTP_201_CREATED,
+                    headers={"Idempotent-Replayed": "true"},
+                )
+
+        order = await service.create_order(request, idempotency_key=idempotency_key)
+    except IdempotencyKeyMismatch as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
         )
     except Exception as e:
         import traceback
@@ -42,69 +73,215 @@ async def create_order(
             detail=f"Failed to create order: {str(e)}"
         )
 
+    return PydanticJSONResponse(order, status_code=status.HTTP_201_CREATED)
+
+
+@router.post("/batch", response_model=List[OrderResponse], status_code=status.HTTP_201_CREATED)
+async def create_orders_batch(
+    request: CreateOrdersBatchRequest,
+    service: OrderService = Depends(get_order_service)
+) -> PydanticJSONResponse:
+    try:
+        orders = await service.create_orders(request.orders)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to create orders: {str(e)}"
+        )
+
+    return PydanticJSONResponse(orders, status_code=status.HTTP_201_CREATED)
+
 
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: UUID,
     service: OrderService = Depends(get_order_service)
-) -> OrderResponse:
-    order = await service.get_order(order_id)
-    if not order:
+) -> PydanticJSONResponse:
+    body = await service.get_order_json(order_id)
+    if body is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
     
-    return OrderResponse(
-        id=order.id,
-        customer_id=order.customer_id,
-        items=order.items,
-        total_amount=order.total_amount,
-        status=order.status,
-        created_at=order.created_at,
-        updated_at=order.updated_at,
+    return PydanticJSONResponse(body)
+
+
+@router.get("/{order_id}/events")
+async def stream_order_events(
+    order_id: UUID,
+    service: OrderService = Depends(get_order_service)
+) -> StreamingResponse:
+    """Server-Sent Events stream of the order's status until it is final"""
+    if await service.get_order_json(order_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
+
+    async def events() -> AsyncIterator[bytes]:
+        async for order_status in _watch_order_status(order_id):
+            if order_status is None:
+                yield b": keepalive\n\n"
+            else:
+                yield b"event: status\ndata: " + _status_message(order_id, order_status) + b"\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
     )
 
 
+@router.websocket("/{order_id}/ws")
+async def watch_order_websocket(websocket: WebSocket, order_id: UUID) -> None:
+    """WebSocket variant of the status stream; closes once the order is final.
+
+    An unknown order gets an error frame and close code 4404, the WebSocket
+    counterpart of the stream's 404.
+    """
+    await websocket.accept()
+    try:
+        found = False
+        async for order_status in _watch_order_status(order_id):
+            found = True
+            if order_status is not None:
+                await websocket.send_bytes(_status_message(order_id, order_status))
+        if not found:
+            await websocket.send_bytes(to_json({"detail": "Order not found"}))
+            await websocket.close(code=4404)
+            return
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
 @router.delete("/{order_id}", response_model=OrderResponse)
 async def cancel_order(
     order_id: UUID,
     reason: str = "Customer cancellation",
     service: OrderService = Depends(get_order_service)
-) -> OrderResponse:
-    order = await service.cancel_order(order_id, reason)
+) -> PydanticJSONResponse:
+    try:
+        order = await service.cancel_order(order_id, reason)
+    except InvalidStatusTransition as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
     
-    return OrderResponse(
-        id=order.id,
-        customer_id=order.customer_id,
-        items=order.items,
-        total_amount=order.total_amount,
-        status=order.status,
-        created_at=order.created_at,
-        updated_at=order.updated_at,
-    )
+    return PydanticJSONResponse(order)
 
 
 @router.get("/customer/{customer_id}", response_model=List[OrderResponse])
 async def list_customer_orders(
     customer_id: UUID,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    stream: bool = False,
     service: OrderService = Depends(get_order_service)
-) -> List[OrderResponse]:
-    orders = await service.list_customer_orders(customer_id)
-    return [
-        OrderResponse(
-            id=order.id,
-            customer_id=order.customer_id,
-            items=order.items,
-            total_amount=order.total_amount,
-            status=order.status,
-            created_at=order.created_at,
-            updated_at=order.updated_at,
+):
+    """List a customer's orders oldest first, one keyset page at a time.
+
+    The cursor for the next page is returned in the ``X-Next-Cursor`` header.
+    With ``stream=true`` every remaining order is sent as NDJSON instead.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+
+    if stream:
+        return StreamingResponse(
+            _stream_customer_orders(customer_id, after),
+            media_type="application/x-ndjson",
+        )
+
+    orders = await service.list_customer_orders(customer_id, limit=limit + 1, after=after)
+    headers = {}
+    if len(orders) > limit:
+        orders = orders[:limit]
+        headers["X-Next-Cursor"] = _encode_cursor(orders[-1])
+
+    return PydanticJSONResponse(orders, headers=headers)
+
+
+@router.get("/product/{product_id}", response_model=List[OrderResponse])
+async def list_product_orders(
+    product_id: UUID,
+    limit: int = Query(100, ge=1, le=1000),
+    service: OrderService = Depends(get_order_service)
+) -> PydanticJSONResponse:
+    orders = await service.list_product_orders(product_id, limit=limit)
+    return PydanticJSONResponse(orders)
+
+
+async def _stream_customer_orders(
+    customer_id: UUID, after: Optional[Tuple[datetime, UUID]]
+) -> AsyncIterator[bytes]:
+    # The stream outlives the request-scoped dependency, so it owns its session
+    async with async_session_maker() as session:
+        service = OrderService(OrderRepository(session), outbox_relay)
+        async for order in service.stream_customer_orders(customer_id, after=after):
+            yield to_json(order) + b"\n"
+
+
+async def _watch_order_status(order_id: UUID) -> AsyncIterator[Optional[OrderStatus]]:
+    """Current status followed by its changes, None on idle keepalive ticks.
+
+    Transitions applied by this instance arrive through the hub at once, and
+    payment results it saw but did not apply make it re-read the order. Any
+    other change made elsewhere is picked up by re-reading the order on each
+    keepalive tick, so it can lag by up to KEEPALIVE_SECONDS.
+    """
+    async with status_hub.subscribe(order_id) as updates:
+        # Read after subscribing so no local transition can slip in between
+        current = await _read_order_status(order_id)
+        if current is None:
+            return
+
+        yield current
+        while not is_terminal(current):
+            idle = False
+            try:
+                latest = await asyncio.wait_for(updates.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                latest, idle = None, True
+            if latest is None:
+                latest = await _read_order_status(order_id)
+                if latest is None or latest == current:
+                    if idle:
+                        yield None
+                    continue
+            if latest != current:
+                current = latest
+                yield current
+
+
+async def _read_order_status(order_id: UUID) -> Optional[OrderStatus]:
+    # Streams outlive the request-scoped dependency, so each read owns its session
+    async with async_session_maker() as session:
+        order = await OrderService(OrderRepository(session), outbox_relay).get_order(order_id)
+    return OrderStatus(order.status) if order else None
+
+
+def _status_message(order_id: UUID, order_status: OrderStatus) -> bytes:
+    return to_json({"order_id": order_id, "status": order_status})
+
+
+def _encode_cursor(order: Order) -> str:
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(order_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
-        for order in orders
-    ]
\ No newline at end of file
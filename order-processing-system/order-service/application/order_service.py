@@ -1,55 +1,225 @@
-from typing import List, Optional
+import hashlib
+import logging
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
 from uuid import UUID
 
-from domain.events import OrderCreated, OrderCancelled, PaymentProcessed, PaymentFailed
-from domain.models import Order, OrderStatus, CreateOrderRequest
+from domain.events import DomainEvent, OrderCreated, OrderCancelled, PaymentProcessed, PaymentFailed
+from domain.models import (
+    CreateOrderRequest,
+    IdempotencyKeyConflict,
+    IdempotencyKeyMismatch,
+    IdempotencyRecord,
+    InvalidStatusTransition,
+    Order,
+    OrderStatus,
+)
+from infrastructure.cache import TTLCache
+from infrastructure.outbox import OutboxRelay
 from infrastructure.repository import OrderRepository
-from infrastructure.message_queue import MessageQueue
+from infrastructure.status_hub import StatusHub
+
+logger = logging.getLogger(__name__)
 
 
 class OrderService:
-    def __init__(self, repository: OrderRepository, message_queue: MessageQueue):
+    def __init__(
+        self,
+        repository: OrderRepository,
+        outbox: OutboxRelay,
+        cache: Optional[TTLCache] = None,
+        idempotency_cache: Optional[TTLCache] = None,
+        status_hub: Optional[StatusHub] = None,
+    ):
         self.repository = repository
-        self.message_queue = message_queue
+        self.outbox = outbox
+        self.cache = cache
+        self.idempotency_cache = idempotency_cache
+        self.status_hub = status_hub
+
+    async def create_order(
+        self, request: CreateOrderRequest, idempotency_key: Optional[str] = None
+    ) -> Order:
+        order = self._build_order(request)
+        idempotency = None
+        if idempotency_key:
+            idempotency = IdempotencyRecord(
+                key=idempotency_key,
+                request_hash=self._fingerprint(request),
+                order_id=order.id,
+            )
+
+        try:
+            created_order = await self.repository.create(
+                order,
+                events=[(self._order_created_event(order), "order.created")],
+                idempotency=idempotency,
+            )
+        except IdempotencyKeyConflict:
+            # A concurrent retry won the race; hand back the order it created
+            record = await self._find_idempotency_record(idempotency_key, request)
+            if record is None:
+                # Purged since the conflict; the caller may simply retry
+                raise
+            return await self.repository.get_by_id(record.order_id)
+
+        if idempotency is not None and self.idempotency_cache is not None:
+            self.idempotency_cache.set(idempotency_key, idempotency)
+        self.outbox.notify()
 
-    async def create_order(self, request: CreateOrderRequest) -> Order:
-        total_amount = sum(item.price * item.quantity for item in request.items)
-        
-        order = Order(
-            customer_id=request.customer_id,
-            items=request.items,
-            total_amount=total_amount,
-        )
-        
-        created_order = await self.repository.create(order)
-        
-        event = OrderCreated(
-            order_id=created_order.id,
-            customer_id=created_order.customer_id,
-            items=created_order.items,
-            total_amount=created_order.total_amount,
-        )
-        await self.message_queue.publish_event(event, "order.created")
-        
         return created_order
 
+    async def replay_create_order(
+        self, idempotency_key: str, request: CreateOrderRequest
+    ) -> Optional[bytes]:
+        """Serialized order previously created under idempotency_key, if any"""
+        record = await self._find_idempotency_record(idempotency_key, request)
+        if record is None:
+            return None
+        return await self.get_order_json(record.order_id)
+
+    async def create_orders(self, requests: List[CreateOrderRequest]) -> List[Order]:
+        orders = [self._build_order(request) for request in requests]
+        created_orders = await self.repository.create_many(
+            orders,
+            events=[(self._order_created_event(order), "order.created") for order in orders],
+        )
+        self.outbox.notify()
+
+        return created_orders
+
     async def get_order(self, order_id: UUID) -> Optional[Order]:
         return await self.repository.get_by_id(order_id)
 
+    async def get_order_json(self, order_id: UUID) -> Optional[bytes]:
+        """Serialized order, answered from the read-through cache when possible"""
+        if self.cache is None:
+            order = await self.repository.get_by_id(order_id)
+            return order.model_dump_json().encode() if order else None
+
+        cached = self.cache.get(order_id)
+        if cached is not None:
+            return cached
+
+        loaded_at = self.cache.clock()
+        order = await self.repository.get_by_id(order_id)
+        if not order:
+            return None
+
+        body = order.model_dump_json().encode()
+        self.cache.set(order_id, body, loaded_at=loaded_at)
+        return body
+
     async def cancel_order(self, order_id: UUID, reason: str) -> Optional[Order]:
-        order = await self.repository.update_status(order_id, OrderStatus.CANCELLED)
-        
-        if order:
-            event = OrderCancelled(order_id=order_id, reason=reason)
-            await self.message_queue.publish_event(event, "order.cancelled")
-        
+        event = OrderCancelled(order_id=order_id, reason=reason)
+        order = await self.repository.update_status(
+            order_id, OrderStatus.CANCELLED, events=[(event, "order.cancelled")]
+        )
+
+        if not order:
+            current = await self.repository.get_by_id(order_id)
+            if current:
+                raise InvalidStatusTransition(current.status, OrderStatus.CANCELLED)
+            return None
+
+        self._status_changed(order_id, OrderStatus.CANCELLED)
+        self.outbox.notify()
         return order
 
     async def handle_payment_processed(self, event: PaymentProcessed) -> None:
-        await self.repository.update_status(event.order_id, OrderStatus.COMPLETED)
+        await self._apply_payment_result(event.order_id, OrderStatus.COMPLETED)
 
     async def handle_payment_failed(self, event: PaymentFailed) -> None:
-        await self.repository.update_status(event.order_id, OrderStatus.FAILED)
+        await self._apply_payment_result(event.order_id, OrderStatus.FAILED)
+
+    async def handle_payment_events(self, events: List[DomainEvent]) -> None:
+        """Apply a micro-batch of payment results in one statement and transaction"""
+        updates = {}
+        for event in events:
+            if event.event_type == "PaymentProcessed":
+                updates[event.order_id] = OrderStatus.COMPLETED
+            elif event.event_type == "PaymentFailed":
+                updates[event.order_id] = OrderStatus.FAILED
+
+        applied = await self.repository.apply_status_updates(updates)
+        for order_id, status in applied:
+            self._status_changed(order_id, status)
+
+        # A result that was not applied here may have been applied by another
+        # instance: drop its cached body and have local watchers re-read it
+        for order_id in updates.keys() - dict(applied).keys():
+            if self.cache is not None:
+                self.cache.invalidate(order_id)
+            if self.status_hub is not None:
+                self.status_hub.notify(order_id)
+
+        if len(applied) < len(updates):
+            logger.info(f"Ignored {len(updates) - len(applied)} stale payment results")
+
+    async def _apply_payment_result(self, order_id: UUID, status: OrderStatus) -> None:
+        order = await self.repository.update_status(order_id, status)
+        if order:
+            self._status_changed(order_id, status)
+        else:
+            logger.info(f"Ignoring stale transition of order {order_id} to {status.value}")
+
+    async def list_customer_orders(
+        self,
+        customer_id: UUID,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[datetime, UUID]] = None,
+    ) -> List[Order]:
+        return await self.repository.list_by_customer(customer_id, limit=limit, after=after)
+
+    async def list_product_orders(self, product_id: UUID, limit: int = 100) -> List[Order]:
+        return await self.repository.list_by_product(product_id, limit=limit)
+
+    def stream_customer_orders(
+        self, customer_id: UUID, after: Optional[Tuple[datetime, UUID]] = None
+    ) -> AsyncIterator[Order]:
+        return self.repository.stream_by_customer(customer_id, after=after)
+
+    async def _find_idempotency_record(
+        self, idempotency_key: str, request: CreateOrderRequest
+    ) -> Optional[IdempotencyRecord]:
+        record = None
+        if self.idempotency_cache is not None:
+            record = self.idempotency_cache.get(idempotency_key)
+        if record is None:
+            record = await self.repository.get_idempotency_record(idempotency_key)
+            if record is None:
+                return None
+            if self.idempotency_cache is not None:
+                self.idempotency_cache.set(idempotency_key, record)
 
-    async def list_customer_orders(self, customer_id: UUID) -> List[Order]:
-        return await self.repository.list_by_customer(customer_id)
\ No newline at end of file
+        if record.request_hash != self._fingerprint(request):
+            raise IdempotencyKeyMismatch(idempotency_key)
+        return record
+
+    def _status_changed(self, order_id: UUID, status: OrderStatus) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(order_id)
+        if self.status_hub is not None:
+            self.status_hub.publish(order_id, status)
+
+    @staticmethod
+    def _fingerprint(request: CreateOrderRequest) -> str:
+        return hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+
+    @staticmethod
+    def _build_order(request: CreateOrderRequest) -> Order:
+        total_amount = sum(item.price * item.quantity for item in request.items)
+        return Order(
+            customer_id=request.customer_id,
+            items=request.items,
+            total_amount=total_amount,
+        )
+
+    @staticmethod
+    def _order_created_event(order: Order) -> OrderCreated:
+        return OrderCreated(
+            order_id=order.id,
+            customer_id=order.customer_id,
+            items=order.items,
+            total_amount=order.total_amount,
+        )
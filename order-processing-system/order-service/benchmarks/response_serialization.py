@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the per-request CPU cost of rendering order list responses.
+
+Compares the previous route path (copy every domain Order into an
+OrderResponse, let FastAPI dump, re-validate through response_model and
+json.dumps the result) with PydanticJSONResponse, which renders the domain
+models in one pydantic-core pass.
+
+Usage: python benchmarks/response_serialization.py [--sizes 1 100 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from typing import List
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from api.responses import PydanticJSONResponse
+from domain.models import Order, OrderItem, OrderResponse
+
+RESPONSE_ADAPTER = TypeAdapter(List[OrderResponse])
+
+
+def make_orders(count: int) -> List[Order]:
+    return [
+        Order(
+            customer_id=uuid4(),
+            items=[
+                OrderItem(product_id=uuid4(), quantity=2, price=10.0),
+                OrderItem(product_id=uuid4(), quantity=1, price=15.0),
+            ],
+            total_amount=35.0,
+        )
+        for _ in range(count)
+    ]
+
+
+def legacy_render(orders: List[Order]) -> bytes:
+    responses = [
+        OrderResponse(
+            id=order.id,
+            customer_id=order.customer_id,
+            items=order.items,
+            total_amount=order.total_amount,
+            status=order.status,
+            created_at=order.created_at,
+            updated_at=order.updated_at,
+        )
+        for order in orders
+    ]
+    # What FastAPI does with a response_model: dump, re-validate, dump to JSON types
+    content = [response.model_dump() for response in responses]
+    validated = RESPONSE_ADAPTER.validate_python(content)
+    return JSONResponse(RESPONSE_ADAPTER.dump_python(validated, mode="json")).body
+
+
+def fast_render(orders: List[Order]) -> bytes:
+    return PydanticJSONResponse(orders).body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'orders':>8} {'legacy µs':>12} {'fast µs':>12} {'speedup':>8}")
+    for size in args.sizes:
+        orders = make_orders(size)
+        assert json.loads(legacy_render(orders)) == json.loads(fast_render(orders))
+
+        number = max(1, 20_000 // size)
+        legacy = min(timeit.repeat(lambda: legacy_render(orders), number=number, repeat=args.repeat))
+        fast = min(timeit.repeat(lambda: fast_render(orders), number=number, repeat=args.repeat))
+        legacy_us = legacy / number * 1e6
+        fast_us = fast / number * 1e6
+        print(f"{size:>8} {legacy_us:>12.1f} {fast_us:>12.1f} {legacy_us / fast_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, FrozenSet, List, Optional
 from uuid import UUID, uuid4
 
 from pydantic import BaseModel, Field
@@ -15,6 +15,68 @@ class OrderStatus(str, Enum):
     FAILED = "failed"
 
 
+# Statuses an order may move to from each status; terminal statuses have none
+ORDER_TRANSITIONS: Dict[OrderStatus, FrozenSet[OrderStatus]] = {
+    OrderStatus.PENDING: frozenset({
+        OrderStatus.CONFIRMED,
+        OrderStatus.PROCESSING,
+        OrderStatus.COMPLETED,
+        OrderStatus.CANCELLED,
+        OrderStatus.FAILED,
+    }),
+    OrderStatus.CONFIRMED: frozenset({
+        OrderStatus.PROCESSING,
+        OrderStatus.COMPLETED,
+        OrderStatus.CANCELLED,
+        OrderStatus.FAILED,
+    }),
+    OrderStatus.PROCESSING: frozenset({
+        OrderStatus.COMPLETED,
+        OrderStatus.CANCELLED,
+        OrderStatus.FAILED,
+    }),
+    OrderStatus.COMPLETED: frozenset(),
+    OrderStatus.CANCELLED: frozenset(),
+    OrderStatus.FAILED: frozenset(),
+}
+
+
+def allowed_sources(target: OrderStatus) -> FrozenSet[OrderStatus]:
+    """Statuses from which an order may move to target"""
+    return frozenset(
+        source for source, targets in ORDER_TRANSITIONS.items() if target in targets
+    )
+
+
+def is_terminal(status: OrderStatus) -> bool:
+    return not ORDER_TRANSITIONS[OrderStatus(status)]
+
+
+class InvalidStatusTransition(Exception):
+    def __init__(self, current: OrderStatus, target: OrderStatus):
+        self.current = OrderStatus(current)
+        self.target = OrderStatus(target)
+        super().__init__(
+            f"Cannot move order from {self.current.value} to {self.target.value}"
+        )
+
+
+class IdempotencyKeyConflict(Exception):
+    """Another request committed an order under the same idempotency key first"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"Idempotency key {key} is already in use")
+
+
+class IdempotencyKeyMismatch(Exception):
+    """An idempotency key was replayed with a different request body"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"Idempotency key {key} was used with a different request")
+
+
 class OrderItem(BaseModel):
     product_id: UUID
     quantity: int = Field(gt=0)
@@ -39,6 +101,16 @@ class CreateOrderRequest(BaseModel):
     items: List[OrderItem]
 
 
+class CreateOrdersBatchRequest(BaseModel):
+    orders: List[CreateOrderRequest] = Field(min_length=1, max_length=1000)
+
+
+class IdempotencyRecord(BaseModel):
+    key: str
+    request_hash: str
+    order_id: UUID
+
+
 class OrderResponse(BaseModel):
     id: UUID
     customer_id: UUID
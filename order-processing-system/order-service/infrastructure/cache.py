@@ -0,0 +1,106 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """In-process LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Invalidation leaves a short-lived tombstone so that a load which started
+    before the invalidation cannot write its stale value back afterwards.
+    Tombstones are kept apart from the entries and never count toward
+    ``max_size``, so a burst of invalidations cannot evict live values.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # key -> invalidation time, oldest first
+        self._tombstones: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, loaded_at: Optional[float] = None) -> None:
+        """Store value unless key was invalidated after ``loaded_at``"""
+        now = self.clock()
+        self._expire_tombstones(now)
+        invalidated_at = self._tombstones.get(key)
+        if invalidated_at is not None and loaded_at is not None and loaded_at <= invalidated_at:
+            return
+
+        self._tombstones.pop(key, None)
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        now = self.clock()
+        self.invalidations += 1
+        self._entries.pop(key, None)
+        self._expire_tombstones(now)
+        self._tombstones[key] = now
+        self._tombstones.move_to_end(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tombstones.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "tombstones": len(self._tombstones),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _expire_tombstones(self, now: float) -> None:
+        while self._tombstones:
+            key, invalidated_at = next(iter(self._tombstones.items()))
+            if invalidated_at + self.ttl > now:
+                break
+            del self._tombstones[key]
+
+
+# Global instances
+order_cache = TTLCache(
+    max_size=int(os.getenv("ORDER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("ORDER_CACHE_TTL", "5")),
+)
+idempotency_cache = TTLCache(
+    max_size=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("IDEMPOTENCY_CACHE_TTL", "3600")),
+)
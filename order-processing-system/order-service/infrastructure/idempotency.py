@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .database import IdempotencyKeyModel, async_session_maker
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyPurger:
+    """Deletes idempotency keys older than ``ttl`` seconds in bounded batches.
+
+    A request retried after its key was purged is treated as a new one, so
+    ``ttl`` has to outlast any client's retry window. Each DELETE takes at
+    most ``batch_size`` rows through the ``created_at`` index.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        ttl: float = 86400.0,
+        interval: float = 300.0,
+        batch_size: int = 1000,
+    ):
+        self.session_maker = session_maker
+        self.ttl = ttl
+        self.interval = interval
+        self.batch_size = batch_size
+
+    async def run(self) -> None:
+        logger.info(f"Idempotency key purge started (ttl {self.ttl}s)")
+        while True:
+            try:
+                purged = await self.purge()
+                if purged:
+                    logger.info(f"Purged {purged} expired idempotency keys")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error purging idempotency keys: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def purge(self) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        purged = 0
+        while True:
+            async with self.session_maker() as session:
+                expired = (
+                    select(IdempotencyKeyModel.key)
+                    .where(IdempotencyKeyModel.created_at < cutoff)
+                    .limit(self.batch_size)
+                )
+                result = await session.execute(
+                    delete(IdempotencyKeyModel).where(IdempotencyKeyModel.key.in_(expired.scalar_subquery()))
+                )
+                await session.commit()
+            purged += result.rowcount
+            if result.rowcount < self.batch_size:
+                return purged
+
+
+# Global instance
+idempotency_purger = IdempotencyKeyPurger(
+    async_session_maker,
+    ttl=float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400")),
+    interval=float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300")),
+    batch_size=int(os.getenv("IDEMPOTENCY_PURGE_BATCH_SIZE", "1000")),
+)
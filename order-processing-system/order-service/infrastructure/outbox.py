@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .database import OutboxModel, async_session_maker
+from .message_queue import MessageQueue, message_queue
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """Drains the transactional outbox and publishes its events to RabbitMQ.
+
+    Rows are claimed with ``FOR UPDATE SKIP LOCKED`` so several service
+    instances can relay concurrently, published as one pipelined batch and
+    deleted in the same transaction. A crash before commit leaves the rows in
+    place, so delivery is at-least-once.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        message_queue: MessageQueue,
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+    ):
+        self.session_maker = session_maker
+        self.message_queue = message_queue
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+
+    def notify(self) -> None:
+        """Wake the relay right after new events have been committed"""
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        logger.info("Outbox relay started")
+        while True:
+            try:
+                relayed = await self.relay_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error relaying outbox events: {e}")
+                relayed = 0
+
+            if relayed < self.batch_size:
+                await self._wait_for_events()
+
+    async def relay_batch(self) -> int:
+        async with self.session_maker() as session:
+            async with session.begin():
+                result = await session.execute(
+                    select(OutboxModel)
+                    .order_by(OutboxModel.created_at)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                records = result.scalars().all()
+                if not records:
+                    return 0
+
+                await self.message_queue.publish_serialized([
+                    (record.payload.encode(), record.event_type, record.routing_key)
+                    for record in records
+                ])
+                await session.execute(
+                    delete(OutboxModel).where(OutboxModel.id.in_([record.id for record in records]))
+                )
+
+        logger.info(f"Relayed {len(records)} outbox events")
+        return len(records)
+
+    async def _wait_for_events(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+
+# Global instance
+outbox_relay = OutboxRelay(
+    async_session_maker,
+    message_queue,
+    batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "100")),
+    poll_interval=float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0")),
+)
@@ -1,37 +1,106 @@
-import json
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
 from uuid import UUID
 
-from sqlalchemy import select, update
+from sqlalchemy import and_, cast, column, insert, literal, or_, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from domain.models import Order, OrderStatus
-from .database import OrderModel
+from pydantic import TypeAdapter
 
+from domain.events import DomainEvent
+from domain.models import (
+    IdempotencyKeyConflict,
+    IdempotencyRecord,
+    Order,
+    OrderItem,
+    OrderStatus,
+    allowed_sources,
+)
+from .database import IdempotencyKeyModel, OrderModel, OutboxModel
+
+_ITEMS_ADAPTER = TypeAdapter(List[OrderItem])
 
-from pydantic import TypeAdapter
-from domain.models import OrderItem
 
 class OrderRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def create(self, order: Order) -> Order:
-        adapter = TypeAdapter(List[OrderItem])
-        items_json = adapter.dump_json(order.items).decode('utf-8')
-        
+    async def create(
+        self,
+        order: Order,
+        events: Sequence[Tuple[DomainEvent, str]] = (),
+        idempotency: Optional[IdempotencyRecord] = None,
+    ) -> Order:
         order_model = OrderModel(
             id=order.id,
             customer_id=order.customer_id,
-            items=items_json,
+            items=order.items,
             total_amount=order.total_amount,
             status=order.status,
         )
         self.session.add(order_model)
-        await self.session.commit()
+        self._stage_events(events)
+        if idempotency is not None:
+            self.session.add(IdempotencyKeyModel(
+                key=idempotency.key,
+                request_hash=idempotency.request_hash,
+                order_id=idempotency.order_id,
+            ))
+
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            # Only a key committed by a concurrent request is a conflict; any
+            # other violation is a real error and propagates unchanged
+            if idempotency is None or await self.get_idempotency_record(idempotency.key) is None:
+                raise
+            raise IdempotencyKeyConflict(idempotency.key)
+
         await self.session.refresh(order_model)
         return self._to_domain(order_model)
 
+    async def get_idempotency_record(self, key: str) -> Optional[IdempotencyRecord]:
+        result = await self.session.execute(
+            select(IdempotencyKeyModel).where(IdempotencyKeyModel.key == key)
+        )
+        record = result.scalar_one_or_none()
+        if not record:
+            return None
+        return IdempotencyRecord(
+            key=record.key,
+            request_hash=record.request_hash,
+            order_id=record.order_id,
+        )
+
+    async def create_many(
+        self, orders: List[Order], events: Sequence[Tuple[DomainEvent, str]] = ()
+    ) -> List[Order]:
+        """Insert all orders with a single multi-row INSERT ... RETURNING"""
+        if not orders:
+            return []
+
+        rows = [
+            {
+                "id": order.id,
+                "customer_id": order.customer_id,
+                "items": order.items,
+                "total_amount": order.total_amount,
+                "status": order.status,
+            }
+            for order in orders
+        ]
+        result = await self.session.scalars(
+            insert(OrderModel).returning(OrderModel, sort_by_parameter_order=True),
+            rows,
+        )
+        order_models = result.all()
+        self._stage_events(events)
+        await self.session.commit()
+        return [self._to_domain(model) for model in order_models]
+
     async def get_by_id(self, order_id: UUID) -> Optional[Order]:
         result = await self.session.execute(
             select(OrderModel).where(OrderModel.id == order_id)
@@ -39,34 +108,142 @@ class OrderRepository:
         order_model = result.scalar_one_or_none()
         return self._to_domain(order_model) if order_model else None
 
-    async def update_status(self, order_id: UUID, status: OrderStatus) -> Optional[Order]:
-        await self.session.execute(
+    async def update_status(
+        self,
+        order_id: UUID,
+        status: OrderStatus,
+        events: Sequence[Tuple[DomainEvent, str]] = (),
+    ) -> Optional[Order]:
+        """Compare-and-set the status in one round-trip.
+
+        Returns the updated order, or None when the order does not exist or its
+        current status does not allow moving to ``status``.
+        """
+        result = await self.session.execute(
             update(OrderModel)
-            .where(OrderModel.id == order_id)
+            .where(
+                OrderModel.id == order_id,
+                OrderModel.status.in_(allowed_sources(status)),
+            )
             .values(status=status)
+            .returning(OrderModel)
+            .execution_options(synchronize_session=False)
+        )
+        order_model = result.scalar_one_or_none()
+        if order_model is not None:
+            self._stage_events(events)
+        await self.session.commit()
+        return self._to_domain(order_model) if order_model else None
+
+    async def apply_status_updates(
+        self, updates: Dict[UUID, OrderStatus]
+    ) -> List[Tuple[UUID, OrderStatus]]:
+        """Apply many transitions with one UPDATE ... FROM (VALUES ...) statement.
+
+        Each row is still compare-and-set against the transition table; only the
+        (order_id, status) pairs that were actually applied are returned.
+        """
+        if not updates:
+            return []
+
+        orders = OrderModel.__table__
+        changes = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("status", orders.c.status.type),
+            name="changes",
+        ).data(list(updates.items()))
+
+        result = await self.session.execute(
+            update(orders)
+            .where(orders.c.id == changes.c.id)
+            .where(or_(*(
+                and_(changes.c.status == target, orders.c.status.in_(allowed_sources(target)))
+                for target in set(updates.values())
+            )))
+            .values(status=cast(changes.c.status, orders.c.status.type))
+            .returning(orders.c.id, orders.c.status)
         )
+        applied = [(row.id, row.status) for row in result]
         await self.session.commit()
-        return await self.get_by_id(order_id)
+        return applied
+
+    async def list_by_customer(
+        self,
+        customer_id: UUID,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[datetime, UUID]] = None,
+    ) -> List[Order]:
+        query = self._customer_orders_query(customer_id, after)
+        if limit is not None:
+            query = query.limit(limit)
 
-    async def list_by_customer(self, customer_id: UUID) -> List[Order]:
+        result = await self.session.execute(query)
+        order_models = result.scalars().all()
+        return [self._to_domain(model) for model in order_models]
+
+    async def list_by_product(self, product_id: UUID, limit: int = 100) -> List[Order]:
+        """Orders containing product_id, served by the GIN index on items"""
         result = await self.session.execute(
-            select(OrderModel).where(OrderModel.customer_id == customer_id)
+            select(OrderModel)
+            .where(OrderModel.items.contains([{"product_id": product_id}]))
+            .order_by(OrderModel.created_at.desc())
+            .limit(limit)
         )
         order_models = result.scalars().all()
         return [self._to_domain(model) for model in order_models]
 
+    async def stream_by_customer(
+        self,
+        customer_id: UUID,
+        after: Optional[Tuple[datetime, UUID]] = None,
+        chunk_size: int = 500,
+    ) -> AsyncIterator[Order]:
+        """Yield orders through a server-side cursor, chunk_size rows at a time"""
+        query = self._customer_orders_query(customer_id, after).execution_options(
+            yield_per=chunk_size
+        )
+        result = await self.session.stream_scalars(query)
+        async for order_model in result:
+            yield self._to_domain(order_model)
+
+    @staticmethod
+    def _customer_orders_query(customer_id: UUID, after: Optional[Tuple[datetime, UUID]]):
+        # Ordered by the (customer_id, created_at, id) index so every page is a range scan
+        query = (
+            select(OrderModel)
+            .where(OrderModel.customer_id == customer_id)
+            .order_by(OrderModel.created_at, OrderModel.id)
+        )
+        if after is not None:
+            created_at, order_id = after
+            query = query.where(
+                tuple_(OrderModel.created_at, OrderModel.id)
+                > tuple_(
+                    literal(created_at, OrderModel.created_at.type),
+                    literal(order_id, OrderModel.id.type),
+                )
+            )
+        return query
+
+    def _stage_events(self, events: Sequence[Tuple[DomainEvent, str]]) -> None:
+        """Write events to the outbox so they commit atomically with the order"""
+        self.session.add_all([
+            OutboxModel(
+                id=event.event_id,
+                event_type=event.event_type,
+                routing_key=routing_key,
+                payload=event.model_dump_json(),
+            )
+            for event, routing_key in events
+        ])
+
     def _to_domain(self, model: OrderModel) -> Order:
-        from domain.models import OrderItem
-        
-        items_data = json.loads(model.items)
-        items = [OrderItem(**item) for item in items_data]
-        
         return Order(
             id=model.id,
             customer_id=model.customer_id,
-            items=items,
+            items=_ITEMS_ADAPTER.validate_json(model.items),
             total_amount=model.total_amount,
             status=model.status,
             created_at=model.created_at,
             updated_at=model.updated_at,
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+from uuid import UUID
+
+from domain.models import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+
+class StatusHub:
+    """In-process pub/sub of order status changes keyed by order_id.
+
+    Transitions applied by this instance are published with their status.
+    Results this instance saw but did not apply are only notified (``None``),
+    and watchers re-read the order; they catch up on any other change on
+    their keepalive ticks (see the order streams).
+    """
+
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self._subscribers: Dict[UUID, Set[asyncio.Queue]] = defaultdict(set)
+
+    @asynccontextmanager
+    async def subscribe(self, order_id: UUID) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[order_id].add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(order_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[order_id]
+
+    def publish(self, order_id: UUID, status: OrderStatus) -> None:
+        self._put(order_id, OrderStatus(status))
+
+    def notify(self, order_id: UUID) -> None:
+        """Tell watchers the order may have changed without knowing to what"""
+        self._put(order_id, None)
+
+    def _put(self, order_id: UUID, update: Optional[OrderStatus]) -> None:
+        for queue in self._subscribers.get(order_id, ()):
+            if queue.full():
+                # A slow watcher only needs the latest status
+                queue.get_nowait()
+            queue.put_nowait(update)
+
+    def watcher_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+# Global instance
+status_hub = StatusHub()
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -7,31 +8,33 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.routes import router
 from application.order_service import OrderService
+from infrastructure.cache import order_cache
 from infrastructure.database import get_db_session
+from infrastructure.idempotency import idempotency_purger
 from infrastructure.repository import OrderRepository
 from infrastructure.message_queue import message_queue
+from infrastructure.outbox import outbox_relay
+from infrastructure.status_hub import status_hub
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 async def setup_event_listeners():
-    """Setup event listeners for payment events"""
-    async def handle_payment_events(event):
+    """Setup micro-batched listeners for payment events"""
+    async def handle_payment_events(events):
         async for session in get_db_session():
             repository = OrderRepository(session)
-            service = OrderService(repository, message_queue)
-            
-            if event.event_type == "PaymentProcessed":
-                await service.handle_payment_processed(event)
-            elif event.event_type == "PaymentFailed":
-                await service.handle_payment_failed(event)
+            service = OrderService(repository, outbox_relay, order_cache, status_hub=status_hub)
+            await service.handle_payment_events(events)
             break
 
     # Subscribe to payment events
-    await message_queue.subscribe_to_events(
+    await message_queue.subscribe_batched(
         ["payment.processed", "payment.failed"],
-        handle_payment_events
+        handle_payment_events,
+        max_batch_size=int(os.getenv("PAYMENT_BATCH_SIZE", "100")),
+        max_wait=int(os.getenv("PAYMENT_BATCH_MAX_WAIT_MS", "50")) / 1000,
     )
 
 
@@ -43,11 +46,21 @@ async def lifespan(app: FastAPI):
     
     # Setup event listeners in background
     asyncio.create_task(setup_event_listeners())
+
+    # Relay committed outbox events to RabbitMQ
+    relay_task = asyncio.create_task(outbox_relay.run())
+
+    # Drop idempotency keys past their retry window
+    purge_task = asyncio.create_task(idempotency_purger.run())
     
     yield
     
     # Shutdown
     logger.info("Shutting down Order Service...")
+    purge_task.cancel()
+    relay_task.cancel()
+    # Let an in-flight relay batch or purge finish unwinding before the connection closes
+    await asyncio.gather(relay_task, purge_task, return_exceptions=True)
     await message_queue.close()
 
 
@@ -1,10 +1,21 @@
+import json
 import pytest
 from unittest.mock import AsyncMock, MagicMock
+from datetime import datetime, timezone
 from uuid import uuid4
 
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import IntegrityError
+from api.responses import PydanticJSONResponse
 from application.order_service import OrderService
-from domain.models import CreateOrderRequest, OrderItem, Order, OrderStatus
+from domain.models import CreateOrderRequest, IdempotencyKeyConflict, IdempotencyKeyMismatch, IdempotencyRecord, InvalidStatusTransition, OrderItem, Order, OrderResponse, OrderStatus, allowed_sources
 from domain.events import PaymentProcessed, PaymentFailed
+from infrastructure.cache import TTLCache
+from infrastructure.database import IdempotencyKeyModel, OrderModel
+from infrastructure.idempotency import IdempotencyKeyPurger
+from infrastructure.repository import OrderRepository
+from infrastructure.message_queue import MessageQueue
+from infrastructure.status_hub import StatusHub
 
 
 class TestOrderService:
@@ -14,12 +25,12 @@ class TestOrderService:
         return AsyncMock()
     
     @pytest.fixture
-    def mock_message_queue(self):
-        return AsyncMock()
+    def mock_outbox(self):
+        return MagicMock()
     
     @pytest.fixture
-    def order_service(self, mock_repository, mock_message_queue):
-        return OrderService(mock_repository, mock_message_queue)
+    def order_service(self, mock_repository, mock_outbox):
+        return OrderService(mock_repository, mock_outbox)
     
     @pytest.fixture
     def sample_order_request(self):
@@ -31,7 +42,7 @@ class TestOrderService:
             ]
         )
 
-    async def test_create_order_success(self, order_service, mock_repository, mock_message_queue, sample_order_request):
+    async def test_create_order_success(self, order_service, mock_repository, mock_outbox, sample_order_request):
         """Test 1: Successful order creation"""
         # Arrange
         expected_order = Order(
@@ -51,10 +62,10 @@ class TestOrderService:
         assert result.total_amount == 35.0
         assert result.status == OrderStatus.PENDING
         mock_repository.create.assert_called_once()
-        mock_message_queue.publish_event.assert_called_once()
+        mock_outbox.notify.assert_called_once()
 
-    async def test_create_order_with_rabbitmq_mock(self, order_service, mock_repository, mock_message_queue, sample_order_request):
-        """Test 2: Mocking RabbitMQ message publishing"""
+    async def test_create_order_with_rabbitmq_mock(self, order_service, mock_repository, mock_outbox, sample_order_request):
+        """Test 2: OrderCreated is staged in the outbox with the order insert"""
         # Arrange
         expected_order = Order(
             id=uuid4(),
@@ -68,17 +79,18 @@ class TestOrderService:
         # Act
         await order_service.create_order(sample_order_request)
         
-        # Assert - Verify RabbitMQ interaction
-        mock_message_queue.publish_event.assert_called_once()
-        call_args = mock_message_queue.publish_event.call_args
-        published_event = call_args[0][0]
-        routing_key = call_args[0][1]
+        # Assert - Verify the event travels through the outbox
+        created_order_arg = mock_repository.create.call_args[0][0]
+        staged_events = mock_repository.create.call_args.kwargs["events"]
+        assert len(staged_events) == 1
+        published_event, routing_key = staged_events[0]
         
         assert published_event.event_type == "OrderCreated"
-        assert published_event.order_id == expected_order.id
+        assert published_event.order_id == created_order_arg.id
         assert routing_key == "order.created"
+        mock_outbox.notify.assert_called_once()
 
-    async def test_create_order_with_postgresql_mock(self, order_service, mock_repository, mock_message_queue, sample_order_request):
+    async def test_create_order_with_postgresql_mock(self, order_service, mock_repository, mock_outbox, sample_order_request):
         """Test 3: Mocking PostgreSQL database operations"""
         # Arrange
         mock_repository.create = AsyncMock()
@@ -136,4 +148,451 @@ class TestOrderService:
         await order_service.handle_payment_failed(event)
         
         # Assert
-        mock_repository.update_status.assert_called_once_with(order_id, OrderStatus.FAILED)
\ No newline at end of file
+        mock_repository.update_status.assert_called_once_with(order_id, OrderStatus.FAILED)
+
+    async def test_create_orders_batch(self, order_service, mock_repository, mock_outbox, sample_order_request):
+        """Batch creation uses one bulk insert and stages every OrderCreated"""
+        # Arrange
+        mock_repository.create_many.side_effect = lambda orders, events: orders
+        requests = [sample_order_request, sample_order_request]
+
+        # Act
+        result = await order_service.create_orders(requests)
+
+        # Assert
+        assert len(result) == 2
+        assert all(order.total_amount == 35.0 for order in result)
+        mock_repository.create_many.assert_called_once()
+        mock_repository.create.assert_not_called()
+        mock_outbox.notify.assert_called_once()
+
+        staged_events = mock_repository.create_many.call_args.kwargs["events"]
+        assert [event.order_id for event, _ in staged_events] == [order.id for order in result]
+        assert all(routing_key == "order.created" for _, routing_key in staged_events)
+
+    async def test_cancel_order_stages_event_in_outbox(self, order_service, mock_repository, mock_outbox):
+        """Cancellation writes OrderCancelled in the same transaction as the update"""
+        # Arrange
+        order_id = uuid4()
+        mock_repository.update_status.return_value = Order(
+            id=order_id,
+            customer_id=uuid4(),
+            items=[OrderItem(product_id=uuid4(), quantity=1, price=10.0)],
+            total_amount=10.0,
+            status=OrderStatus.CANCELLED
+        )
+
+        # Act
+        await order_service.cancel_order(order_id, "Changed my mind")
+
+        # Assert
+        args, kwargs = mock_repository.update_status.call_args
+        assert args == (order_id, OrderStatus.CANCELLED)
+        event, routing_key = kwargs["events"][0]
+        assert event.event_type == "OrderCancelled"
+        assert routing_key == "order.cancelled"
+        mock_outbox.notify.assert_called_once()
+
+    async def test_list_customer_orders_passes_keyset(self, order_service, mock_repository):
+        """Listing forwards the page size and keyset position to the repository"""
+        # Arrange
+        customer_id = uuid4()
+        after = (datetime(2026, 1, 1, tzinfo=timezone.utc), uuid4())
+        mock_repository.list_by_customer.return_value = []
+
+        # Act
+        await order_service.list_customer_orders(customer_id, limit=51, after=after)
+
+        # Assert
+        mock_repository.list_by_customer.assert_called_once_with(customer_id, limit=51, after=after)
+
+    async def test_get_order_json_is_served_from_cache(self, mock_repository, mock_outbox):
+        """Repeated polls hit the cache; payment events invalidate it"""
+        # Arrange
+        service = OrderService(mock_repository, mock_outbox, TTLCache())
+        order = Order(
+            customer_id=uuid4(),
+            items=[OrderItem(product_id=uuid4(), quantity=1, price=10.0)],
+            total_amount=10.0
+        )
+        mock_repository.get_by_id.return_value = order
+
+        # Act
+        first = await service.get_order_json(order.id)
+        second = await service.get_order_json(order.id)
+        await service.handle_payment_processed(
+            PaymentProcessed(order_id=order.id, payment_id=uuid4(), amount=10.0)
+        )
+        await service.get_order_json(order.id)
+
+        # Assert
+        assert first == second == order.model_dump_json().encode()
+        assert mock_repository.get_by_id.call_count == 2
+        assert service.cache.stats()["hits"] == 1
+
+    async def test_idempotent_replay_skips_order_creation(self, mock_repository, mock_outbox, sample_order_request):
+        """A retried request is answered from the key caches without creating an order"""
+        # Arrange
+        service = OrderService(mock_repository, mock_outbox, TTLCache(), TTLCache())
+        created = Order(
+            customer_id=sample_order_request.customer_id,
+            items=sample_order_request.items,
+            total_amount=35.0
+        )
+        mock_repository.create.return_value = created
+        mock_repository.get_by_id.return_value = created
+
+        # Act
+        await service.create_order(sample_order_request, idempotency_key="retry-1")
+        replayed = await service.replay_create_order("retry-1", sample_order_request)
+
+        # Assert
+        assert replayed == created.model_dump_json().encode()
+        mock_repository.create.assert_called_once()
+        mock_repository.get_idempotency_record.assert_not_called()
+        record = mock_repository.create.call_args.kwargs["idempotency"]
+        assert record.key == "retry-1"
+
+    async def test_idempotency_key_reused_with_other_body(self, order_service, mock_repository, sample_order_request):
+        """Replaying a key with a different payload is rejected"""
+        # Arrange
+        mock_repository.get_idempotency_record.return_value = IdempotencyRecord(
+            key="retry-1", request_hash="not-this-request", order_id=uuid4()
+        )
+
+        # Act / Assert
+        with pytest.raises(IdempotencyKeyMismatch):
+            await order_service.replay_create_order("retry-1", sample_order_request)
+
+    async def test_concurrent_retry_returns_winning_order(self, order_service, mock_repository, mock_outbox, sample_order_request):
+        """Losing the unique-key race returns the order committed by the winner"""
+        # Arrange
+        winner = Order(
+            customer_id=sample_order_request.customer_id,
+            items=sample_order_request.items,
+            total_amount=35.0
+        )
+        mock_repository.create.side_effect = IdempotencyKeyConflict("retry-1")
+        mock_repository.get_idempotency_record.return_value = IdempotencyRecord(
+            key="retry-1",
+            request_hash=OrderService._fingerprint(sample_order_request),
+            order_id=winner.id,
+        )
+        mock_repository.get_by_id.return_value = winner
+
+        # Act
+        result = await order_service.create_order(sample_order_request, idempotency_key="retry-1")
+
+        # Assert
+        assert result == winner
+        mock_outbox.notify.assert_not_called()
+
+    async def test_handle_payment_events_applies_batch_in_one_call(self, mock_repository, mock_outbox):
+        """A micro-batch becomes a single bulk status update that invalidates every order in it"""
+        # Arrange
+        cache = TTLCache()
+        service = OrderService(mock_repository, mock_outbox, cache)
+        completed_id, failed_id, stale_id = uuid4(), uuid4(), uuid4()
+        events = [
+            PaymentProcessed(order_id=completed_id, payment_id=uuid4(), amount=10.0),
+            PaymentFailed(order_id=failed_id, payment_id=uuid4(), reason="Declined"),
+            PaymentProcessed(order_id=stale_id, payment_id=uuid4(), amount=10.0),
+        ]
+        mock_repository.apply_status_updates.return_value = [
+            (completed_id, OrderStatus.COMPLETED),
+            (failed_id, OrderStatus.FAILED),
+        ]
+
+        # Act
+        await service.handle_payment_events(events)
+
+        # Assert
+        mock_repository.apply_status_updates.assert_called_once_with({
+            completed_id: OrderStatus.COMPLETED,
+            failed_id: OrderStatus.FAILED,
+            stale_id: OrderStatus.COMPLETED,
+        })
+        mock_repository.update_status.assert_not_called()
+        assert cache.invalidations == 3
+
+    async def test_status_change_reaches_watchers(self, mock_repository, mock_outbox):
+        """Applied payment results are pushed to subscribed status watchers"""
+        # Arrange
+        hub = StatusHub()
+        service = OrderService(mock_repository, mock_outbox, status_hub=hub)
+        order = Order(
+            customer_id=uuid4(),
+            items=[OrderItem(product_id=uuid4(), quantity=1, price=10.0)],
+            total_amount=10.0,
+            status=OrderStatus.COMPLETED
+        )
+        mock_repository.update_status.return_value = order
+
+        # Act
+        async with hub.subscribe(order.id) as updates:
+            await service.handle_payment_processed(
+                PaymentProcessed(order_id=order.id, payment_id=uuid4(), amount=10.0)
+            )
+
+        # Assert
+        assert updates.get_nowait() == OrderStatus.COMPLETED
+        assert hub.watcher_count() == 0
+
+    async def test_unapplied_payment_result_makes_watchers_re_read(self, mock_repository, mock_outbox, monkeypatch):
+        """A result applied by another instance still wakes this instance's watchers"""
+        # Arrange
+        from api import routes
+
+        hub = StatusHub()
+        service = OrderService(mock_repository, mock_outbox, status_hub=hub)
+        mock_repository.apply_status_updates.return_value = []
+        order_id = uuid4()
+        reads = iter([OrderStatus.PENDING, OrderStatus.COMPLETED])
+
+        async def read_order_status(order_id):
+            return next(reads)
+
+        monkeypatch.setattr(routes, "status_hub", hub)
+        monkeypatch.setattr(routes, "_read_order_status", read_order_status)
+
+        # Act
+        watch = routes._watch_order_status(order_id)
+        first = await anext(watch)
+        await service.handle_payment_events(
+            [PaymentProcessed(order_id=order_id, payment_id=uuid4(), amount=10.0)]
+        )
+        rest = [order_status async for order_status in watch]
+
+        # Assert
+        assert [first, *rest] == [OrderStatus.PENDING, OrderStatus.COMPLETED]
+
+    async def test_status_watch_picks_up_transitions_from_other_instances(self, monkeypatch):
+        """A keepalive tick re-reads the order, so changes applied elsewhere still arrive"""
+        # Arrange
+        from api import routes
+
+        reads = iter([OrderStatus.PENDING, OrderStatus.PENDING, OrderStatus.COMPLETED])
+
+        async def read_order_status(order_id):
+            return next(reads)
+
+        monkeypatch.setattr(routes, "_read_order_status", read_order_status)
+        monkeypatch.setattr(routes, "KEEPALIVE_SECONDS", 0.01)
+
+        # Act
+        statuses = [order_status async for order_status in routes._watch_order_status(uuid4())]
+
+        # Assert
+        assert statuses == [OrderStatus.PENDING, None, OrderStatus.COMPLETED]
+
+
+    def test_websocket_for_unknown_order_sends_error_and_closes(self, monkeypatch):
+        """The WebSocket stream mirrors the SSE 404 for an unknown order"""
+        # Arrange
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from starlette.websockets import WebSocketDisconnect
+        from api import routes
+
+        async def read_order_status(order_id):
+            return None
+
+        monkeypatch.setattr(routes, "_read_order_status", read_order_status)
+        app = FastAPI()
+        app.include_router(routes.router)
+
+        # Act
+        with TestClient(app).websocket_connect(f"/orders/{uuid4()}/ws") as websocket:
+            frame = json.loads(websocket.receive_bytes())
+            with pytest.raises(WebSocketDisconnect) as closed:
+                websocket.receive_bytes()
+
+        # Assert
+        assert frame == {"detail": "Order not found"}
+        assert closed.value.code == 4404
+
+class TestTTLCache:
+
+    def test_lru_eviction_and_ttl_expiry(self):
+        now = [0.0]
+        cache = TTLCache(max_size=2, ttl=10.0, clock=lambda: now[0])
+        cache.set("a", b"1")
+        cache.set("b", b"2")
+        cache.get("a")
+        cache.set("c", b"3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"1"
+        assert cache.evictions == 1
+
+        now[0] = 11.0
+        assert cache.get("a") is None
+        assert cache.stats()["misses"] == 2
+
+    def test_invalidation_wins_over_in_flight_load(self):
+        now = [0.0]
+        cache = TTLCache(ttl=10.0, clock=lambda: now[0])
+        loaded_at = cache.clock()
+        now[0] = 1.0
+        cache.invalidate("a")
+        cache.set("a", b"stale", loaded_at=loaded_at)
+
+        assert cache.get("a") is None
+
+        now[0] = 2.0
+        cache.set("a", b"fresh", loaded_at=cache.clock())
+        assert cache.get("a") == b"fresh"
+
+    def test_tombstones_do_not_evict_live_entries(self):
+        now = [0.0]
+        cache = TTLCache(max_size=2, ttl=10.0, clock=lambda: now[0])
+        cache.set("a", b"1")
+        cache.set("b", b"2")
+        for key in range(100):
+            cache.invalidate(key)
+
+        assert cache.get("a") == b"1" and cache.get("b") == b"2"
+        assert cache.evictions == 0
+        assert cache.stats()["tombstones"] == 100
+
+        now[0] = 11.0
+        cache.invalidate("c")
+        assert cache.stats()["tombstones"] == 1
+
+
+class TestOrderRepository:
+
+    def test_to_domain_validates_items_from_raw_json(self):
+        """JSONB items arrive as raw text and are validated in one pass"""
+        product_id = uuid4()
+        model = OrderModel(
+            id=uuid4(),
+            customer_id=uuid4(),
+            items=f'[{{"product_id": "{product_id}", "quantity": 2, "price": 10.0}}]',
+            total_amount=20.0,
+            status=OrderStatus.PENDING,
+            created_at=datetime.now(timezone.utc),
+        )
+
+        order = OrderRepository(session=None)._to_domain(model)
+
+        assert order.items == [OrderItem(product_id=product_id, quantity=2, price=10.0)]
+
+    async def test_idempotency_purge_deletes_expired_keys_in_batches(self):
+        session = AsyncMock()
+        session_maker = MagicMock()
+        session_maker.return_value.__aenter__.return_value = session
+        session.execute.side_effect = [MagicMock(rowcount=2), MagicMock(rowcount=1)]
+        purger = IdempotencyKeyPurger(session_maker, ttl=60, batch_size=2)
+
+        assert await purger.purge() == 3
+
+        statement = str(session.execute.call_args_list[0].args[0].compile())
+        assert "DELETE FROM idempotency_keys" in statement
+        assert "idempotency_keys.created_at <" in statement
+
+
+    async def test_create_reports_conflict_only_for_a_committed_idempotency_key(self):
+        """Integrity errors other than a taken idempotency key propagate unchanged"""
+        # Arrange
+        session = AsyncMock()
+        session.add = session.add_all = MagicMock()
+        session.commit.side_effect = IntegrityError("INSERT", {}, Exception("orders_pkey"))
+        taken = MagicMock()
+        taken.scalar_one_or_none.return_value = IdempotencyKeyModel(
+            key="retry-1", request_hash="hash", order_id=uuid4()
+        )
+        free = MagicMock()
+        free.scalar_one_or_none.return_value = None
+        session.execute.side_effect = [taken, free]
+        repository = OrderRepository(session)
+        order = Order(
+            customer_id=uuid4(),
+            items=[OrderItem(product_id=uuid4(), quantity=1, price=10.0)],
+            total_amount=10.0
+        )
+        idempotency = IdempotencyRecord(key="retry-1", request_hash="hash", order_id=order.id)
+
+        # Act / Assert
+        with pytest.raises(IdempotencyKeyConflict):
+            await repository.create(order, idempotency=idempotency)
+        with pytest.raises(IntegrityError):
+            await repository.create(order, idempotency=idempotency)
+
+class TestOrderTransitions:
+
+    def test_terminal_statuses_cannot_be_left(self):
+        assert OrderStatus.CANCELLED not in allowed_sources(OrderStatus.COMPLETED)
+        assert OrderStatus.COMPLETED not in allowed_sources(OrderStatus.CANCELLED)
+        assert allowed_sources(OrderStatus.PENDING) == frozenset()
+
+    async def test_cancel_completed_order_is_rejected(self):
+        repository = AsyncMock()
+        outbox = MagicMock()
+        order_id = uuid4()
+        repository.update_status.return_value = None
+        repository.get_by_id.return_value = Order(
+            id=order_id,
+            customer_id=uuid4(),
+            items=[OrderItem(product_id=uuid4(), quantity=1, price=10.0)],
+            total_amount=10.0,
+            status=OrderStatus.COMPLETED
+        )
+
+        with pytest.raises(InvalidStatusTransition):
+            await OrderService(repository, outbox).cancel_order(order_id, "Too late")
+
+        outbox.notify.assert_not_called()
+
+
+class TestPydanticJSONResponse:
+
+    def test_renders_same_json_as_response_model(self):
+        """Domain orders render exactly like the declared OrderResponse"""
+        order = Order(
+            customer_id=uuid4(),
+            items=[OrderItem(product_id=uuid4(), quantity=2, price=10.0)],
+            total_amount=20.0
+        )
+
+        fast = json.loads(PydanticJSONResponse([order]).body)
+        expected = jsonable_encoder([OrderResponse(**order.model_dump())])
+
+        assert fast == expected
+
+
+class TestMessageQueue:
+
+    async def test_failing_redelivered_batch_rejects_only_the_poison_message(self):
+        queue = MessageQueue()
+        queue.channel = AsyncMock()
+        amqp_queue = queue.channel.declare_queue.return_value
+        good = PaymentProcessed(order_id=uuid4(), payment_id=uuid4(), amount=10.0)
+        poison = PaymentFailed(order_id=uuid4(), payment_id=uuid4(), reason="Declined")
+
+        async def callback(events):
+            if any(event.order_id == poison.order_id for event in events):
+                raise ValueError("cannot apply")
+
+        await queue.subscribe_batched(["payment.*"], callback, max_batch_size=2)
+        handler = amqp_queue.consume.call_args.args[0]
+
+        messages = []
+        for event in (good, poison):
+            message = AsyncMock()
+            message.body = event.model_dump_json().encode()
+            message.headers = {"event_type": event.event_type}
+            message.redelivered = False
+            messages.append(message)
+
+        # First delivery: the whole batch goes back to the queue
+        for message in messages:
+            await handler(message)
+        messages[-1].nack.assert_called_once_with(multiple=True, requeue=True)
+
+        # Redelivered: settled one by one, only the poison message is dropped
+        for message in messages:
+            message.redelivered = True
+            await handler(message)
+        messages[0].ack.assert_called_once_with()
+        messages[1].reject.assert_called_once_with(requeue=False)
@@ -0,0 +1,27 @@
+"""unique payment order id
+
+Revision ID: 3f7a92c5e1d8
+Revises: 8c41d7e2a9f6
+Create Date: 2026-10-17 21:58:41.730265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f7a92c5e1d8'
+down_revision = '8c41d7e2a9f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Fails if an order already has several payments; resolve those first
+    op.drop_index(op.f('ix_payments_order_id'), table_name='payments')
+    op.create_index(op.f('ix_payments_order_id'), 'payments', ['order_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_payments_order_id'), table_name='payments')
+    op.create_index(op.f('ix_payments_order_id'), 'payments', ['order_id'], unique=False)
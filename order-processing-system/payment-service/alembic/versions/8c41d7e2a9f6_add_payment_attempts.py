@@ -0,0 +1,24 @@
+"""add payment attempts
+
+Revision ID: 8c41d7e2a9f6
+Revises: 00b78785e905
+Create Date: 2026-10-17 21:32:08.514907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d7e2a9f6'
+down_revision = '00b78785e905'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('payments', sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('payments', 'attempts')
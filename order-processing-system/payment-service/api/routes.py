@@ -4,25 +4,34 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from api.responses import PydanticJSONResponse
 from application.payment_service import PaymentService
 from domain.models import PaymentResponse
+from infrastructure.circuit_breaker import payment_breaker, payment_bulkhead
 from infrastructure.database import get_db_session
 from infrastructure.repository import PaymentRepository
 from infrastructure.message_queue import message_queue
+from infrastructure.payment_gateway import payment_gateway
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 
 async def get_payment_service(session: AsyncSession = Depends(get_db_session)) -> PaymentService:
     repository = PaymentRepository(session)
-    return PaymentService(repository, message_queue)
+    return PaymentService(repository, message_queue, payment_gateway)
+
+
+@router.get("/_breaker")
+async def get_breaker_stats() -> dict:
+    """State and counters of the gateway circuit breaker and bulkhead"""
+    return {"breaker": payment_breaker.stats(), "bulkhead": payment_bulkhead.stats()}
 
 
 @router.get("/{payment_id}", response_model=PaymentResponse)
 async def get_payment(
     payment_id: UUID,
     service: PaymentService = Depends(get_payment_service)
-) -> PaymentResponse:
+) -> PydanticJSONResponse:
     """Get payment by ID"""
     payment = await service.get_payment(payment_id)
     if not payment:
@@ -31,21 +40,14 @@ async def get_payment(
             detail="Payment not found"
         )
     
-    return PaymentResponse(
-        id=payment.id,
-        order_id=payment.order_id,
-        amount=payment.amount,
-        status=payment.status,
-        created_at=payment.created_at,
-        updated_at=payment.updated_at,
-    )
+    return PydanticJSONResponse(payment)
 
 
 @router.get("/order/{order_id}", response_model=PaymentResponse)
 async def get_payment_by_order(
     order_id: UUID,
     service: PaymentService = Depends(get_payment_service)
-) -> PaymentResponse:
+) -> PydanticJSONResponse:
     """Get payment by order ID"""
     payment = await service.get_payment_by_order(order_id)
     if not payment:
@@ -54,11 +56,4 @@ async def get_payment_by_order(
             detail="Payment not found for this order"
         )
     
-    return PaymentResponse(
-        id=payment.id,
-        order_id=payment.order_id,
-        amount=payment.amount,
-        status=payment.status,
-        created_at=payment.created_at,
-        updated_at=payment.updated_at,
-    )
\ No newline at end of file
+    return PydanticJSONResponse(payment)
\ No newline at end of file
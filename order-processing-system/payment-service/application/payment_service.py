@@ -1,51 +1,54 @@
-import asyncio
 import logging
-import random
-from typing import Optional
+from typing import Optional, Sequence
 from uuid import UUID
 
-from tenacity import retry, stop_after_attempt, wait_exponential
-
-from domain.events import InventoryReserved, PaymentProcessed, PaymentFailed
-from domain.models import Payment, PaymentStatus
+from domain.events import InventoryReserved, PaymentFailed, PaymentProcessed, PaymentRetry
+from domain.models import TERMINAL_STATUSES, Payment, PaymentStatus
 from infrastructure.repository import PaymentRepository
 from infrastructure.message_queue import MessageQueue
+from infrastructure.circuit_breaker import CallRejected
+from infrastructure.payment_gateway import GatewayError, PaymentGateway
+from infrastructure.settlement import SettlementBatcher
 
 logger = logging.getLogger(__name__)
 
+RETRY_DELAYS_MS = (1000, 2000, 4000)
+DEFERRED_DELAY_MS = 5000
+
 
 class PaymentService:
-    def __init__(self, repository: PaymentRepository, message_queue: MessageQueue):
+    def __init__(
+        self,
+        repository: PaymentRepository,
+        message_queue: MessageQueue,
+        gateway: PaymentGateway,
+        retry_delays_ms: Sequence[int] = RETRY_DELAYS_MS,
+        deferred_delay_ms: int = DEFERRED_DELAY_MS,
+        settlement: Optional[SettlementBatcher] = None,
+    ):
         self.repository = repository
         self.message_queue = message_queue
+        self.gateway = gateway
+        self.retry_delays_ms = retry_delays_ms
+        self.deferred_delay_ms = deferred_delay_ms
+        self.settlement = settlement
 
     async def handle_inventory_reserved(self, event: InventoryReserved) -> None:
         try:
             payment = Payment(
                 order_id=event.order_id,
-                amount=1.0,
+                amount=event.total_amount,
                 status=PaymentStatus.PENDING
             )
             
-            created_payment = await self.repository.create(payment)
-            success = await self._process_payment_with_retry(created_payment.id)
-            
-            if success:
-                await self.repository.update_status(created_payment.id, PaymentStatus.COMPLETED)
-                success_event = PaymentProcessed(
-                    order_id=event.order_id,
-                    payment_id=created_payment.id,
-                    amount=created_payment.amount
-                )
-                await self.message_queue.publish_event(success_event, "payment.processed")
-            else:
-                await self.repository.update_status(created_payment.id, PaymentStatus.FAILED)
-                failure_event = PaymentFailed(
-                    order_id=event.order_id,
-                    payment_id=created_payment.id,
-                    reason="Payment processing failed after retries"
-                )
-                await self.message_queue.publish_event(failure_event, "payment.failed")
+            created_payment, created = await self.repository.create(payment)
+            if not created and (created_payment.status in TERMINAL_STATUSES or created_payment.attempts > 0):
+                # Settled, or charged before and owned by its retry chain
+                logger.info(f"Order {event.order_id} already has a {created_payment.status} payment, skipping redelivery")
+                return
+            # A pending payment never charged (the earlier delivery stopped
+            # short of it) is taken over, unless a concurrent delivery claims it
+            await self._attempt_payment(created_payment)
                 
         except Exception as e:
             logger.error(f"Error handling inventory reserved event: {e}")
@@ -56,23 +59,92 @@ class PaymentService:
             )
             await self.message_queue.publish_event(failure_event, "payment.failed")
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=1, max=10),
-        reraise=True
-    )
-    async def _process_payment_with_retry(self, payment_id: UUID) -> bool:
-        logger.info(f"Processing payment {payment_id}")
-        await asyncio.sleep(0.1)
-        
-        # Simulate success/fail rate
-        success = random.random() < 0.8
+    async def handle_payment_retry(self, event: PaymentRetry) -> None:
+        """A parked payment came back from its retry queue.
+
+        Any failure parks the retry again in the deferred queue; the message
+        itself is dropped on errors, so this is the only way back.
+        """
+        try:
+            payment = await self.repository.get_by_id(event.payment_id)
+            if payment is None or payment.status != PaymentStatus.PENDING:
+                logger.info(f"Payment {event.payment_id} is no longer pending, dropping retry")
+                return
+            await self._attempt_payment(payment)
+        except Exception as e:
+            logger.error(f"Retry of payment {event.payment_id} failed, parking it again: {e}")
+            await self.message_queue.publish_retry(event, self.deferred_delay_ms)
+
+    async def _attempt_payment(self, payment: Payment) -> None:
+        """Charge once; on failure park a retry instead of waiting in the handler.
+
+        The attempt count lives on the payment row, so the backoff survives
+        restarts and the message is acked straight away. The attempt is
+        claimed before the charge, so duplicate deliveries of the same attempt
+        are dropped. Calls refused by the circuit breaker or bulkhead give the
+        attempt back and are parked in the deferred queue.
+        """
+        if not await self.repository.claim_attempt(payment.id, payment.attempts):
+            logger.info(f"Attempt {payment.attempts + 1} of payment {payment.id} already claimed, skipping")
+            return
+
+        attempts = payment.attempts + 1
+        try:
+            await self._charge_claimed(payment, attempts)
+        except Exception:
+            # Give the attempt back so the next delivery can claim it again
+            await self.repository.release_attempt(payment.id, attempts)
+            raise
+
+    async def _charge_claimed(self, payment: Payment, attempts: int) -> None:
+        retry = attempts <= len(self.retry_delays_ms)
+        decline_status = PaymentStatus.PENDING if retry else PaymentStatus.FAILED
+        try:
+            if self.settlement:
+                success = await self.settlement.settle(payment, decline_status)
+            else:
+                success = await self._process_payment(payment)
+                await self.repository.record_outcome(
+                    payment.id, PaymentStatus.COMPLETED if success else decline_status
+                )
+        except CallRejected as e:
+            logger.warning(f"Payment {payment.id} deferred: {e}")
+            await self.repository.release_attempt(payment.id, attempts)
+            retry_event = PaymentRetry(order_id=payment.order_id, payment_id=payment.id)
+            await self.message_queue.publish_retry(retry_event, self.deferred_delay_ms)
+            return
+
+        if success:
+            success_event = PaymentProcessed(
+                order_id=payment.order_id,
+                payment_id=payment.id,
+                amount=payment.amount
+            )
+            await self.message_queue.publish_event(success_event, "payment.processed")
+        elif retry:
+            retry_event = PaymentRetry(order_id=payment.order_id, payment_id=payment.id)
+            await self.message_queue.publish_retry(retry_event, self.retry_delays_ms[attempts - 1])
+        else:
+            failure_event = PaymentFailed(
+                order_id=payment.order_id,
+                payment_id=payment.id,
+                reason=f"Payment processing failed after {attempts} attempts"
+            )
+            await self.message_queue.publish_event(failure_event, "payment.failed")
+
+    async def _process_payment(self, payment: Payment) -> bool:
+        logger.info(f"Processing payment {payment.id}")
+        try:
+            success = await self.gateway.charge(payment)
+        except GatewayError as e:
+            logger.warning(f"Payment {payment.id} not charged: {e}")
+            return False
         
         if not success:
-            logger.warning(f"Payment {payment_id} failed, will retry")
-            raise Exception("Payment processing failed")
+            logger.warning(f"Payment {payment.id} declined")
+            return False
         
-        logger.info(f"Payment {payment_id} processed successfully")
+        logger.info(f"Payment {payment.id} processed successfully")
         return True
 
     async def get_payment(self, payment_id: UUID) -> Optional[Payment]:
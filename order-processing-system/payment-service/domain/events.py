@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -10,11 +11,25 @@ class DomainEvent(BaseModel):
     event_type: str
 
 
+class ReservedItem(BaseModel):
+    product_id: UUID
+    quantity: int
+    price: float
+
+
 class InventoryReserved(DomainEvent):
+    """Every line of an order was reserved; one event per order"""
     event_type: str = "InventoryReserved"
     order_id: UUID
-    product_id: UUID
-    quantity: int
+    items: List[ReservedItem]
+    total_amount: float
+
+
+class PaymentRetry(DomainEvent):
+    """Internal: charge a pending payment again once its retry delay has passed"""
+    event_type: str = "PaymentRetry"
+    order_id: UUID
+    payment_id: UUID
 
 
 class PaymentProcessed(DomainEvent):
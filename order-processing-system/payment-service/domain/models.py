@@ -14,11 +14,15 @@ class PaymentStatus(str, Enum):
     CANCELLED = "CANCELLED"
 
 
+TERMINAL_STATUSES = (PaymentStatus.COMPLETED, PaymentStatus.FAILED, PaymentStatus.CANCELLED)
+
+
 class Payment(BaseModel):
     id: UUID = Field(default_factory=uuid4)
     order_id: UUID
     amount: float = Field(gt=0)
     status: PaymentStatus = PaymentStatus.PENDING
+    attempts: int = Field(ge=0, default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
 
@@ -31,5 +35,6 @@ class PaymentResponse(BaseModel):
     order_id: UUID
     amount: float
     status: PaymentStatus
+    attempts: int = 0
     created_at: datetime
     updated_at: Optional[datetime] = None
\ No newline at end of file
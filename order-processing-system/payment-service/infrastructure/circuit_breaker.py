@@ -0,0 +1,193 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CallRejected(Exception):
+    """A call was refused without reaching the dependency"""
+
+
+class CircuitOpen(CallRejected):
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Circuit open, retry in {retry_after:.1f}s")
+
+
+class BulkheadFull(CallRejected):
+    def __init__(self, max_concurrent: int, max_waiting: int):
+        super().__init__(f"Bulkhead full: {max_concurrent} calls in flight, {max_waiting} waiting")
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a rolling error-rate window.
+
+    While closed, outcomes of the last ``window`` seconds are kept; once at
+    least ``min_calls`` of them exist and the failure share reaches
+    ``failure_rate`` the circuit opens and every call is rejected for
+    ``open_for`` seconds. It then lets ``half_open_calls`` probes through:
+    all of them succeeding closes it, any failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        window: float = 30.0,
+        min_calls: int = 20,
+        open_for: float = 10.0,
+        half_open_calls: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.open_for = open_for
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self._state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.clock() - self._opened_at >= self.open_for:
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return self.open_for - (self.clock() - self._opened_at)
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self._state == HALF_OPEN:
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._close()
+            return
+        self._record(True)
+
+    def record_failure(self) -> None:
+        if self._state == HALF_OPEN:
+            self._open()
+            return
+        self._record(False)
+        calls = len(self._outcomes)
+        if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+            self._open()
+
+    def abandon(self) -> None:
+        """An allowed call ended without an outcome (e.g. cancelled)"""
+        if self._state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        self._expire(self.clock())
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "calls_in_window": calls,
+            "failures_in_window": self._failures,
+            "failure_rate": self._failures / calls if calls else 0.0,
+            "failure_rate_threshold": self.failure_rate,
+            "window_seconds": self.window,
+            "retry_after_seconds": self.retry_after(),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+    def _record(self, success: bool) -> None:
+        now = self.clock()
+        self._outcomes.append((now, success))
+        if not success:
+            self._failures += 1
+        self._expire(now)
+
+    def _expire(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] <= now - self.window:
+            _, success = self._outcomes.popleft()
+            if not success:
+                self._failures -= 1
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self.times_opened += 1
+
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+
+
+class Bulkhead:
+    """Caps concurrent calls; beyond ``max_waiting`` queued callers, calls are rejected"""
+
+    def __init__(self, max_concurrent: int = 50, max_waiting: int = 100):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self._semaphore = asyncio.BoundedSemaphore(max_concurrent)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def __aenter__(self) -> None:
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise BulkheadFull(self.max_concurrent, self.max_waiting)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+# Global instance
+payment_breaker = CircuitBreaker(
+    failure_rate=float(os.getenv("PAYMENT_BREAKER_FAILURE_RATE", "0.5")),
+    window=float(os.getenv("PAYMENT_BREAKER_WINDOW_SECONDS", "30")),
+    min_calls=int(os.getenv("PAYMENT_BREAKER_MIN_CALLS", "20")),
+    open_for=float(os.getenv("PAYMENT_BREAKER_OPEN_SECONDS", "10")),
+    half_open_calls=int(os.getenv("PAYMENT_BREAKER_HALF_OPEN_CALLS", "5")),
+)
+
+payment_bulkhead = Bulkhead(
+    max_concurrent=int(os.getenv("PAYMENT_MAX_CONCURRENCY", "50")),
+    max_waiting=int(os.getenv("PAYMENT_MAX_WAITING", "100")),
+)
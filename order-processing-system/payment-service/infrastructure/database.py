@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, text
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import os
@@ -25,9 +25,10 @@ class Payment(Base):
     __tablename__ = "payments"
     
     id = Column(UUID(as_uuid=True), primary_key=True, index=True)
-    order_id = Column(UUID(as_uuid=True), index=True)
+    order_id = Column(UUID(as_uuid=True), unique=True, index=True)
     amount = Column(Float)
     status = Column(Enum(PaymentStatus), default=PaymentStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0, server_default=text("0"))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+import random
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+import httpx
+
+from domain.models import Payment
+from .circuit_breaker import Bulkhead, CircuitBreaker, CircuitOpen, payment_breaker, payment_bulkhead
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class GatewayError(Exception):
+    """The gateway could not be reached or did not answer within the deadline"""
+
+
+class PaymentGateway(ABC):
+    @abstractmethod
+    async def charge(self, payment: Payment) -> bool:
+        """Charge a payment; returns whether it was approved, raises GatewayError otherwise"""
+
+    async def charge_batch(self, payments: Sequence[Payment]) -> List[bool]:
+        """Approval per payment, in order; GatewayError if the batch as a whole failed.
+
+        Gateways without a batch API charge concurrently; a payment whose own
+        call failed counts as not approved.
+        """
+        results = await asyncio.gather(*(self.charge(payment) for payment in payments), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, GatewayError):
+                raise result
+        return [result is True for result in results]
+
+    async def close(self) -> None:
+        pass
+
+
+class SimulatedGateway(PaymentGateway):
+    """In-process stand-in: fixed latency and a random decline rate"""
+
+    def __init__(self, latency: float = 0.1, success_rate: float = 0.8):
+        self.latency = latency
+        self.success_rate = success_rate
+
+    async def charge(self, payment: Payment) -> bool:
+        await asyncio.sleep(self.latency)
+        return random.random() < self.success_rate
+
+    async def charge_batch(self, payments: Sequence[Payment]) -> List[bool]:
+        await asyncio.sleep(self.latency)
+        return [random.random() < self.success_rate for _ in payments]
+
+
+class HttpPaymentGateway(PaymentGateway):
+    """Gateway reached over HTTP through one pooled keep-alive client.
+
+    At most ``max_connections`` requests are in flight; callers beyond that
+    wait for a pooled connection, and that wait counts against the per-call
+    ``deadline`` like the request itself. The payment id is sent as the
+    idempotency key, so a retried charge is not applied twice.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int = 100,
+        deadline: float = 2.0,
+        keepalive_expiry: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.deadline = deadline
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(deadline),
+            transport=transport,
+        )
+
+    async def charge(self, payment: Payment) -> bool:
+        response = await self._post(
+            "/charges", self._charge(payment), headers={"Idempotency-Key": str(payment.id)}
+        )
+        return response.status_code == 200 and response.json().get("approved", False)
+
+    async def charge_batch(self, payments: Sequence[Payment]) -> List[bool]:
+        """One ``POST /charges/batch``; each charge carries its own idempotency key"""
+        response = await self._post("/charges/batch", {"charges": [self._charge(payment) for payment in payments]})
+        if response.status_code != 200:
+            return [False] * len(payments)
+        approved = {result["payment_id"]: result.get("approved", False) for result in response.json()["results"]}
+        return [approved.get(str(payment.id), False) for payment in payments]
+
+    async def _post(self, path: str, body: dict, headers: Optional[dict] = None) -> httpx.Response:
+        try:
+            async with asyncio.timeout(self.deadline):
+                response = await self.client.post(path, json=body, headers=headers)
+        except (TimeoutError, httpx.HTTPError) as e:
+            raise GatewayError(f"Gateway call failed: {e!r}") from e
+
+        if response.status_code >= 500:
+            raise GatewayError(f"Gateway returned {response.status_code}")
+        return response
+
+    @staticmethod
+    def _charge(payment: Payment) -> dict:
+        return {
+            "payment_id": str(payment.id),
+            "order_id": str(payment.order_id),
+            "amount": payment.amount,
+        }
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class GuardedGateway(PaymentGateway):
+    """A gateway behind a concurrency bulkhead and a circuit breaker.
+
+    Declines are answers, not faults; only GatewayError counts against the
+    breaker. Rejected calls raise CallRejected without touching the gateway.
+    """
+
+    def __init__(self, gateway: PaymentGateway, breaker: CircuitBreaker, bulkhead: Bulkhead):
+        self.gateway = gateway
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+
+    async def charge(self, payment: Payment) -> bool:
+        return await self._guarded(lambda: self.gateway.charge(payment))
+
+    async def charge_batch(self, payments: Sequence[Payment]) -> List[bool]:
+        """A batch takes one bulkhead slot and counts as one breaker outcome"""
+        return await self._guarded(lambda: self.gateway.charge_batch(payments))
+
+    async def _guarded(self, call: Callable[[], Awaitable[T]]) -> T:
+        async with self.bulkhead:
+            if not self.breaker.allow():
+                raise CircuitOpen(self.breaker.retry_after())
+            try:
+                result = await call()
+            except GatewayError:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def close(self) -> None:
+        await self.gateway.close()
+
+
+def create_gateway() -> PaymentGateway:
+    """HTTP gateway when PAYMENT_GATEWAY_URL is set, the in-process simulation otherwise"""
+    base_url = os.getenv("PAYMENT_GATEWAY_URL")
+    if not base_url:
+        return SimulatedGateway()
+    logger.info(f"Using payment gateway at {base_url}")
+    return HttpPaymentGateway(
+        base_url,
+        max_connections=int(os.getenv("PAYMENT_GATEWAY_MAX_CONNECTIONS", "100")),
+        deadline=int(os.getenv("PAYMENT_GATEWAY_TIMEOUT_MS", "2000")) / 1000,
+    )
+
+
+# Global instance
+payment_gateway = GuardedGateway(create_gateway(), payment_breaker, payment_bulkhead)
@@ -1,7 +1,9 @@
-from typing import Optional
+from typing import Optional, Sequence, Tuple
 from uuid import UUID
 
-from sqlalchemy import select, update
+from sqlalchemy import cast, column, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from domain.models import Payment, PaymentStatus
@@ -12,17 +14,28 @@ class PaymentRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def create(self, payment: Payment) -> Payment:
-        payment_model = PaymentModel(
-            id=payment.id,
-            order_id=payment.order_id,
-            amount=payment.amount,
-            status=payment.status,
+    async def create(self, payment: Payment) -> Tuple[Payment, bool]:
+        """Insert the order's payment unless it has one; returns (payment, created).
+
+        ``INSERT ... ON CONFLICT (order_id) DO NOTHING RETURNING`` makes a
+        redelivered event cost one statement instead of a second payment.
+        """
+        result = await self.session.execute(
+            insert(PaymentModel)
+            .values(
+                id=payment.id,
+                order_id=payment.order_id,
+                amount=payment.amount,
+                status=payment.status,
+            )
+            .on_conflict_do_nothing(index_elements=[PaymentModel.order_id])
+            .returning(PaymentModel)
         )
-        self.session.add(payment_model)
+        payment_model = result.scalar_one_or_none()
         await self.session.commit()
-        await self.session.refresh(payment_model)
-        return self._to_domain(payment_model)
+        if payment_model is not None:
+            return self._to_domain(payment_model), True
+        return await self.get_by_order_id(payment.order_id), False
 
     async def get_by_id(self, payment_id: UUID) -> Optional[Payment]:
         result = await self.session.execute(
@@ -38,6 +51,65 @@ class PaymentRepository:
         payment_model = result.scalar_one_or_none()
         return self._to_domain(payment_model) if payment_model else None
 
+    async def claim_attempt(self, payment_id: UUID, attempts: int) -> bool:
+        """Take the next charge attempt of a pending payment that made ``attempts`` so far.
+
+        The conditional UPDATE lets exactly one of several deliveries of the
+        same payment (a redelivered event, a duplicated retry) charge it.
+        """
+        result = await self.session.execute(
+            update(PaymentModel)
+            .where(
+                PaymentModel.id == payment_id,
+                PaymentModel.attempts == attempts,
+                PaymentModel.status == PaymentStatus.PENDING,
+            )
+            .values(attempts=PaymentModel.attempts + 1)
+            .returning(PaymentModel.id)
+        )
+        claimed = result.scalar_one_or_none() is not None
+        await self.session.commit()
+        return claimed
+
+    async def release_attempt(self, payment_id: UUID, attempts: int) -> None:
+        """Give back a claimed attempt (``attempts`` including it) that never reached the gateway"""
+        await self.session.execute(
+            update(PaymentModel)
+            .where(
+                PaymentModel.id == payment_id,
+                PaymentModel.attempts == attempts,
+                PaymentModel.status == PaymentStatus.PENDING,
+            )
+            .values(attempts=PaymentModel.attempts - 1)
+        )
+        await self.session.commit()
+
+    async def record_outcome(self, payment_id: UUID, status: PaymentStatus) -> None:
+        """Store the outcome of a claimed attempt"""
+        await self.session.execute(
+            update(PaymentModel)
+            .where(PaymentModel.id == payment_id)
+            .values(status=status)
+        )
+        await self.session.commit()
+
+    async def record_outcomes(self, outcomes: Sequence[Tuple[UUID, PaymentStatus]]) -> None:
+        """Store the outcomes of many claimed attempts in one UPDATE ... FROM (VALUES ...)"""
+        if not outcomes:
+            return
+        payments = PaymentModel.__table__
+        settled = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("status", payments.c.status.type),
+            name="settled",
+        ).data(list(outcomes))
+        await self.session.execute(
+            update(payments)
+            .where(payments.c.id == settled.c.id)
+            .values(status=cast(settled.c.status, payments.c.status.type))
+        )
+        await self.session.commit()
+
     async def update_status(self, payment_id: UUID, status: PaymentStatus) -> Optional[Payment]:
         await self.session.execute(
             update(PaymentModel)
@@ -53,6 +125,7 @@ class PaymentRepository:
             order_id=model.order_id,
             amount=model.amount,
             status=model.status,
+            attempts=model.attempts,
             created_at=model.created_at,
             updated_at=model.updated_at,
         )
\ No newline at end of file
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy.orm import sessionmaker
+
+from domain.models import Payment, PaymentStatus
+from .database import AsyncSessionLocal
+from .payment_gateway import GatewayError, PaymentGateway, payment_gateway
+from .repository import PaymentRepository
+
+logger = logging.getLogger(__name__)
+
+PendingSettlement = Tuple[Payment, PaymentStatus, asyncio.Future]
+
+
+class SettlementBatcher:
+    """Settles concurrently pending payments as one gateway batch.
+
+    Each caller of ``settle`` waits until ``max_batch_size`` payments are
+    pending or ``max_wait`` seconds passed since the first one. The batch is
+    charged with one ``charge_batch`` call and every outcome is written with
+    one bulk UPDATE; each caller then gets its own approval back and
+    publishes its own event.
+    """
+
+    def __init__(
+        self,
+        session_maker: sessionmaker,
+        gateway: PaymentGateway,
+        max_batch_size: int = 100,
+        max_wait: float = 0.05,
+    ):
+        self.session_maker = session_maker
+        self.gateway = gateway
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[PendingSettlement] = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def settle(self, payment: Payment, decline_status: PaymentStatus) -> bool:
+        """Charge within the next batch; stores COMPLETED or ``decline_status``.
+
+        Raises CallRejected, without storing anything, if the batch was refused
+        by the circuit breaker or bulkhead.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((payment, decline_status, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._spawn(self._flush())
+        elif len(self._pending) == 1:
+            self._spawn(self._flush_later())
+        return await future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.max_wait)
+        await self._flush()
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        if not batch:
+            return
+
+        payments = [payment for payment, _, _ in batch]
+        try:
+            try:
+                approvals = await self.gateway.charge_batch(payments)
+            except GatewayError as e:
+                logger.warning(f"Settlement batch of {len(batch)} payments not charged: {e}")
+                approvals = [False] * len(batch)
+
+            async with self.session_maker() as session:
+                await PaymentRepository(session).record_outcomes([
+                    (payment.id, PaymentStatus.COMPLETED if approved else decline_status)
+                    for (payment, decline_status, _), approved in zip(batch, approvals)
+                ])
+        except Exception as e:
+            # A refused batch (CallRejected) or a failed write reaches every caller
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), approved in zip(batch, approvals):
+            if not future.done():
+                future.set_result(approved)
+        logger.info(f"Settled batch of {len(batch)} payments, {sum(approvals)} approved")
+
+    def _spawn(self, flush) -> None:
+        task = asyncio.create_task(flush)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+def create_settlement() -> Optional[SettlementBatcher]:
+    """Batch settlement when PAYMENT_SETTLEMENT_MODE=batch, per-payment charges otherwise"""
+    if os.getenv("PAYMENT_SETTLEMENT_MODE", "single") != "batch":
+        return None
+    return SettlementBatcher(
+        AsyncSessionLocal,
+        payment_gateway,
+        max_batch_size=int(os.getenv("PAYMENT_SETTLEMENT_BATCH_SIZE", "100")),
+        max_wait=int(os.getenv("PAYMENT_SETTLEMENT_MAX_WAIT_MS", "50")) / 1000,
+    )
+
+
+# Global instance
+settlement_batcher = create_settlement()
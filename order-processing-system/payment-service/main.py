@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -10,26 +11,39 @@ from application.payment_service import PaymentService
 from infrastructure.database import get_db_session
 from infrastructure.repository import PaymentRepository
 from infrastructure.message_queue import message_queue
+from infrastructure.payment_gateway import payment_gateway
+from infrastructure.settlement import settlement_batcher
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+RETRY_DELAYS_MS = [int(delay) for delay in os.getenv("PAYMENT_RETRY_DELAYS_MS", "1000,2000,4000").split(",")]
+DEFERRED_DELAY_MS = int(os.getenv("PAYMENT_DEFERRED_DELAY_MS", "5000"))
+
+
 async def setup_event_listeners():
     """Setup event listeners for inventory events"""
     async def handle_inventory_events(event):
         async for session in get_db_session():
             repository = PaymentRepository(session)
-            service = PaymentService(repository, message_queue)
+            service = PaymentService(
+                repository, message_queue, payment_gateway, RETRY_DELAYS_MS, DEFERRED_DELAY_MS, settlement_batcher
+            )
             
             if event.event_type == "InventoryReserved":
                 await service.handle_inventory_reserved(event)
+            elif event.event_type == "PaymentRetry":
+                await service.handle_payment_retry(event)
             break
 
-    # Subscribe to inventory events
-    await message_queue.subscribe_to_events(
+    # Durable queue shared by all instances; failed charges come back through the retry queues
+    await message_queue.subscribe_work_queue(
+        "payment.inventory_reserved",
         ["inventory.reserved"],
-        handle_inventory_events
+        handle_inventory_events,
+        retry_delays_ms=sorted({*RETRY_DELAYS_MS, DEFERRED_DELAY_MS}),
+        prefetch_count=int(os.getenv("PAYMENT_PREFETCH", "200")),
     )
 
 
@@ -47,6 +61,7 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down Payment Service...")
     await message_queue.close()
+    await payment_gateway.close()
 
 
 app = FastAPI(
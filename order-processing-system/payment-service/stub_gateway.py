@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import math
+import random
+from typing import List
+
+from fastapi import FastAPI, Response
+from pydantic import BaseModel
+
+
+class ChargeRequest(BaseModel):
+    payment_id: str
+    order_id: str
+    amount: float
+
+
+class ChargeBatchRequest(BaseModel):
+    charges: List[ChargeRequest]
+
+
+def create_app(
+    median_ms: float = 50.0,
+    p99_ms: float = 250.0,
+    decline_rate: float = 0.2,
+    error_rate: float = 0.0,
+) -> FastAPI:
+    """Local gateway with log-normally distributed latency.
+
+    ``decline_rate`` of the charges are answered ``approved: false`` and
+    ``error_rate`` of them with a 503. Repeated idempotency keys get the
+    first answer back. A batch costs one latency sample and fails as a whole.
+    """
+    app = FastAPI(title="Stub Payment Gateway")
+    mu = math.log(median_ms)
+    # 2.326 is the standard normal 99th percentile
+    sigma = max(math.log(p99_ms / median_ms) / 2.326, 0.0)
+    answers = {}
+
+    def answer(request: ChargeRequest) -> dict:
+        if request.payment_id not in answers:
+            answers[request.payment_id] = {
+                "payment_id": request.payment_id,
+                "approved": random.random() >= decline_rate,
+            }
+        return answers[request.payment_id]
+
+    @app.post("/charges")
+    async def charge(request: ChargeRequest, response: Response) -> dict:
+        await asyncio.sleep(random.lognormvariate(mu, sigma) / 1000)
+        if request.payment_id not in answers and random.random() < error_rate:
+            response.status_code = 503
+            return {"error": "gateway unavailable"}
+        return answer(request)
+
+    @app.post("/charges/batch")
+    async def charge_batch(request: ChargeBatchRequest, response: Response) -> dict:
+        await asyncio.sleep(random.lognormvariate(mu, sigma) / 1000)
+        if random.random() < error_rate:
+            response.status_code = 503
+            return {"error": "gateway unavailable"}
+        return {"results": [answer(charge) for charge in request.charges]}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local stub payment gateway")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--median-ms", type=float, default=50.0)
+    parser.add_argument("--p99-ms", type=float, default=250.0)
+    parser.add_argument("--decline-rate", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.median_ms, args.p99_ms, args.decline_rate, args.error_rate),
+        host="0.0.0.0",
+        port=args.port,
+        log_level="warning",
+    )
@@ -1,92 +1,317 @@
+import asyncio
+
+import httpx
 import pytest
-from unittest.mock import AsyncMock, patch, MagicMock
+from sqlalchemy.dialects import postgresql
+from unittest.mock import AsyncMock, MagicMock
 from uuid import uuid4
-from domain.events import InventoryReserved
+from domain.events import InventoryReserved, PaymentRetry, ReservedItem
 from application.payment_service import PaymentService
 from domain.models import Payment, PaymentStatus
+from infrastructure.circuit_breaker import Bulkhead, CircuitBreaker
+from infrastructure.payment_gateway import GatewayError, GuardedGateway, HttpPaymentGateway
+from infrastructure.repository import PaymentRepository
+from infrastructure.settlement import SettlementBatcher
 
 @pytest.mark.asyncio
 async def test_handle_inventory_reserved_success():
     # Arrange
     mock_repo = AsyncMock()
     mock_queue = AsyncMock()
-    service = PaymentService(mock_repo, mock_queue)
+    mock_gateway = AsyncMock()
+    mock_gateway.charge.return_value = True
+    service = PaymentService(mock_repo, mock_queue, mock_gateway)
     
     order_id = uuid4()
     event = InventoryReserved(
         order_id=order_id,
-        product_id=uuid4(),
-        quantity=2,
+        items=[ReservedItem(product_id=uuid4(), quantity=2, price=50.0)],
+        total_amount=100.0,
         event_id=uuid4()
     )
     
-    mock_repo.create.return_value = Payment(
+    mock_repo.create.return_value = (Payment(
         id=uuid4(),
         order_id=order_id,
         amount=100.0,
         status=PaymentStatus.PENDING
-    )
+    ), True)
     
     # Act
-    # Mock private method _process_payment_with_retry to avoid waiting/randomness
-    # But checking if we can patch it directly on the instance or class
-    # Better to patch the 'random.random' as we did, OR patch the method.
-    # Since the method has a decorator 'retry', patching it might be tricky.
-    # Let's patch 'random.random' as before, but call the PUBLIC METHOD handle_inventory_reserved
-    
-    with patch('application.payment_service.random.random', return_value=0.1): # Success
-         with patch('application.payment_service.asyncio.sleep'): # Skip sleep
-            await service.handle_inventory_reserved(event)
+    await service.handle_inventory_reserved(event)
 
     # Assert
-    mock_repo.update_status.assert_called()
-    # Check that update_status was called with COMPLETED
-    call_args = mock_repo.update_status.call_args
+    mock_repo.record_outcome.assert_called_once()
+    # Check that the attempt was recorded as COMPLETED
+    call_args = mock_repo.record_outcome.call_args
     assert call_args[0][1] == PaymentStatus.COMPLETED
     
-    mock_queue.publish_event.assert_called()
+    mock_queue.publish_event.assert_called_once()
     assert mock_queue.publish_event.call_args[0][1] == "payment.processed"
+    assert mock_repo.create.call_args[0][0].amount == 100.0
 
 @pytest.mark.asyncio
 async def test_handle_inventory_reserved_failure():
     # Arrange
     mock_repo = AsyncMock()
     mock_queue = AsyncMock()
-    service = PaymentService(mock_repo, mock_queue)
+    mock_gateway = AsyncMock()
+    mock_gateway.charge.side_effect = GatewayError("timed out")
+    service = PaymentService(mock_repo, mock_queue, mock_gateway)
     
     order_id = uuid4()
     event = InventoryReserved(
         order_id=order_id,
-        product_id=uuid4(),
-        quantity=2,
+        items=[ReservedItem(product_id=uuid4(), quantity=2, price=50.0)],
+        total_amount=100.0,
         event_id=uuid4()
     )
     
-    mock_repo.create.return_value = Payment(
+    mock_repo.create.return_value = (Payment(
         id=uuid4(),
         order_id=order_id,
         amount=100.0,
         status=PaymentStatus.PENDING
-    )
+    ), True)
 
     # Act
-    # Force failure 3 times to trigger stop_after_attempt(3)
-    with patch('application.payment_service.random.random', return_value=0.9): 
-        with patch('application.payment_service.asyncio.sleep'):
-            # The retry logic will raise Exception after 3 failed attempts
-            # But handle_inventory_reserved catches Exception
-            await service.handle_inventory_reserved(event)
+    await service.handle_inventory_reserved(event)
 
     # Assert
-    # Should update status to FAILED
-    mock_repo.update_status.assert_not_called() 
-    # Wait, the code says: if exception -> logger.error ... publish failure event.
-    # It DOES NOT update DB status to FAILED in the 'except' block?
-    # Let's check logic:
-    # try: ... success = _process... if success: update ... else: update FAILED
-    # except: log ... publish failure.
-    # Retry raises Exception. So it goes to 'except'.
-    # So DB status remains PENDING in DB, but event FAILED is published.
-    
-    mock_queue.publish_event.assert_called()
+    # The failed attempt is recorded and parked in the first retry queue
+    # instead of being retried inside the handler
+    assert mock_repo.record_outcome.call_args[0][1] == PaymentStatus.PENDING
+    mock_queue.publish_event.assert_not_called()
+    retry_event, delay_ms = mock_queue.publish_retry.call_args[0]
+    assert isinstance(retry_event, PaymentRetry)
+    assert delay_ms == 1000
+
+@pytest.mark.asyncio
+async def test_handle_payment_retry_fails_payment_after_last_delay():
+    # Arrange
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    mock_gateway = AsyncMock()
+    mock_gateway.charge.return_value = False
+    service = PaymentService(mock_repo, mock_queue, mock_gateway, retry_delays_ms=(1000, 2000))
+    payment = Payment(order_id=uuid4(), amount=100.0, status=PaymentStatus.PENDING, attempts=2)
+    mock_repo.get_by_id.return_value = payment
+
+    # Act
+    await service.handle_payment_retry(PaymentRetry(order_id=payment.order_id, payment_id=payment.id))
+
+    # Assert
+    assert mock_repo.record_outcome.call_args[0][1] == PaymentStatus.FAILED
+    mock_queue.publish_retry.assert_not_called()
     assert mock_queue.publish_event.call_args[0][1] == "payment.failed"
+
+@pytest.mark.asyncio
+async def test_handle_payment_retry_skips_settled_payment():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    service = PaymentService(mock_repo, mock_queue, AsyncMock())
+    payment = Payment(order_id=uuid4(), amount=100.0, status=PaymentStatus.COMPLETED, attempts=1)
+    mock_repo.get_by_id.return_value = payment
+
+    await service.handle_payment_retry(PaymentRetry(order_id=payment.order_id, payment_id=payment.id))
+
+    mock_repo.record_outcome.assert_not_called()
+    mock_queue.publish_event.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_retry_that_fails_to_publish_gives_back_its_attempt_and_is_parked_again():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    mock_queue.publish_retry.side_effect = [ConnectionError("broker down"), None]
+    mock_gateway = AsyncMock()
+    mock_gateway.charge.return_value = False
+    service = PaymentService(
+        mock_repo, mock_queue, mock_gateway, retry_delays_ms=(1000, 2000), deferred_delay_ms=500
+    )
+    payment = Payment(order_id=uuid4(), amount=100.0, status=PaymentStatus.PENDING, attempts=1)
+    mock_repo.get_by_id.return_value = payment
+    event = PaymentRetry(order_id=payment.order_id, payment_id=payment.id)
+
+    await service.handle_payment_retry(event)
+
+    mock_repo.release_attempt.assert_awaited_once_with(payment.id, 2)
+    assert mock_queue.publish_retry.await_args_list[0].args[1] == 2000
+    assert mock_queue.publish_retry.await_args_list[1].args == (event, 500)
+
+@pytest.mark.asyncio
+async def test_http_gateway_reuses_pooled_client_and_enforces_deadline():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.headers["Idempotency-Key"])
+        if len(calls) == 2:
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={"approved": True})
+
+    gateway = HttpPaymentGateway(
+        "http://gateway", max_connections=4, deadline=0.05, transport=httpx.MockTransport(handler)
+    )
+    payment = Payment(order_id=uuid4(), amount=10.0)
+
+    assert await gateway.charge(payment) is True
+    with pytest.raises(GatewayError):
+        await gateway.charge(payment)
+    assert calls == [str(payment.id), str(payment.id)]
+    await gateway.close()
+
+@pytest.mark.asyncio
+async def test_redelivered_inventory_reserved_is_a_no_op_once_settled():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    mock_gateway = AsyncMock()
+    service = PaymentService(mock_repo, mock_queue, mock_gateway)
+    order_id = uuid4()
+    mock_repo.create.return_value = (
+        Payment(order_id=order_id, amount=100.0, status=PaymentStatus.COMPLETED, attempts=1),
+        False,
+    )
+
+    await service.handle_inventory_reserved(InventoryReserved(
+        order_id=order_id,
+        items=[ReservedItem(product_id=uuid4(), quantity=1, price=100.0)],
+        total_amount=100.0
+    ))
+
+    mock_gateway.charge.assert_not_called()
+    mock_repo.record_outcome.assert_not_called()
+    mock_queue.publish_event.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_redelivered_inventory_reserved_leaves_charged_pending_payment_to_its_retries():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    mock_gateway = AsyncMock()
+    service = PaymentService(mock_repo, mock_queue, mock_gateway)
+    order_id = uuid4()
+    mock_repo.create.return_value = (
+        Payment(order_id=order_id, amount=100.0, status=PaymentStatus.PENDING, attempts=1),
+        False,
+    )
+
+    await service.handle_inventory_reserved(InventoryReserved(
+        order_id=order_id,
+        items=[ReservedItem(product_id=uuid4(), quantity=1, price=100.0)],
+        total_amount=100.0
+    ))
+
+    mock_repo.claim_attempt.assert_not_called()
+    mock_gateway.charge.assert_not_called()
+    mock_queue.publish_retry.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_attempt_claimed_by_another_delivery_is_not_charged():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    mock_gateway = AsyncMock()
+    service = PaymentService(mock_repo, mock_queue, mock_gateway)
+    payment = Payment(order_id=uuid4(), amount=100.0, status=PaymentStatus.PENDING, attempts=1)
+    mock_repo.get_by_id.return_value = payment
+    mock_repo.claim_attempt.return_value = False
+
+    await service.handle_payment_retry(PaymentRetry(order_id=payment.order_id, payment_id=payment.id))
+
+    mock_repo.claim_attempt.assert_called_once_with(payment.id, 1)
+    mock_gateway.charge.assert_not_called()
+    mock_repo.record_outcome.assert_not_called()
+    mock_queue.publish_event.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_create_inserts_on_conflict_and_returns_existing_payment():
+    session = AsyncMock()
+    inserted = MagicMock()
+    inserted.scalar_one_or_none.return_value = None
+    session.execute.side_effect = [inserted, MagicMock()]
+    repository = PaymentRepository(session)
+    existing = Payment(order_id=uuid4(), amount=100.0, status=PaymentStatus.FAILED)
+    repository.get_by_order_id = AsyncMock(return_value=existing)
+
+    payment, created = await repository.create(Payment(order_id=existing.order_id, amount=100.0))
+
+    assert (payment, created) == (existing, False)
+    assert "ON CONFLICT (order_id) DO NOTHING" in str(
+        session.execute.call_args_list[0].args[0].compile(dialect=postgresql.dialect())
+    )
+
+def test_circuit_breaker_opens_on_error_rate_and_closes_after_probes():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_rate=0.5, window=10, min_calls=4, open_for=5, half_open_calls=2, clock=lambda: now[0])
+
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record_success() if success else breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    now[0] = 5.0
+    assert breaker.state == "half_open"
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats()["rejected"] == 2
+
+@pytest.mark.asyncio
+async def test_open_circuit_parks_payment_without_using_an_attempt():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    inner = AsyncMock()
+    breaker = CircuitBreaker(min_calls=1, open_for=60)
+    breaker.record_failure()
+    gateway = GuardedGateway(inner, breaker, Bulkhead(max_concurrent=1))
+    service = PaymentService(mock_repo, mock_queue, gateway, deferred_delay_ms=7000)
+    payment = Payment(order_id=uuid4(), amount=100.0, status=PaymentStatus.PENDING)
+    mock_repo.get_by_id.return_value = payment
+
+    await service.handle_payment_retry(PaymentRetry(order_id=payment.order_id, payment_id=payment.id))
+
+    inner.charge.assert_not_called()
+    mock_repo.record_outcome.assert_not_called()
+    mock_repo.release_attempt.assert_called_once_with(payment.id, 1)
+    assert mock_queue.publish_retry.call_args[0][1] == 7000
+
+@pytest.mark.asyncio
+async def test_settlement_batches_charges_and_status_updates():
+    session = AsyncMock()
+    session_maker = MagicMock()
+    session_maker.return_value.__aenter__.return_value = session
+    gateway = AsyncMock()
+    gateway.charge_batch.return_value = [True, False, True]
+    batcher = SettlementBatcher(session_maker, gateway, max_batch_size=3, max_wait=60)
+    payments = [Payment(order_id=uuid4(), amount=10.0) for _ in range(3)]
+
+    approvals = await asyncio.gather(*(
+        batcher.settle(payment, PaymentStatus.PENDING) for payment in payments
+    ))
+
+    assert approvals == [True, False, True]
+    gateway.charge_batch.assert_called_once_with(payments)
+    # One bulk UPDATE for the whole batch
+    session.execute.assert_called_once()
+    session.commit.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_batch_mode_publishes_one_outcome_per_payment():
+    mock_repo = AsyncMock()
+    mock_queue = AsyncMock()
+    settlement = AsyncMock()
+    settlement.settle.return_value = True
+    service = PaymentService(mock_repo, mock_queue, AsyncMock(), settlement=settlement)
+    order_id = uuid4()
+    mock_repo.create.return_value = (Payment(order_id=order_id, amount=100.0), True)
+
+    await service.handle_inventory_reserved(InventoryReserved(
+        order_id=order_id,
+        items=[ReservedItem(product_id=uuid4(), quantity=1, price=100.0)],
+        total_amount=100.0
+    ))
+
+    assert settlement.settle.call_args[0][1] == PaymentStatus.PENDING
+    # The batcher stores the outcome; no per-payment status write
+    mock_repo.record_outcome.assert_not_called()
+    assert mock_queue.publish_event.call_args[0][1] == "payment.processed"
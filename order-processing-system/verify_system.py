@@ -5,7 +5,6 @@ Prueba todos los casos de uso y la comunicación entre servicios
 """
 import requests
 import json
-import time
 from uuid import uuid4
 
 BASE_URLS = {
@@ -15,6 +14,8 @@ BASE_URLS = {
     'notification': 'http://localhost:8004'
 }
 
+FINAL_STATUSES = {'completed', 'failed', 'cancelled'}
+
 def print_header(text):
     print("\n" + "="*70)
     print(f"  {text}")
@@ -91,16 +92,28 @@ def test_get_order(order_id):
 
 def test_event_processing(order_id):
     print_header("TEST 4: EVENT PROCESSING")
-    time.sleep(3)
+    statuses = []
     try:
-        response = requests.get(f"{BASE_URLS['order']}/orders/{order_id}", timeout=5)
-        if response.status_code == 200:
-            order = response.json()
-            print_info(f"Status: {order.get('status')}")
-            return True
+        # The stream closes as soon as the order reaches a final status. Idle
+        # streams send a keepalive every 15s, so the read timeout is longer.
+        with requests.get(f"{BASE_URLS['order']}/orders/{order_id}/events", stream=True, timeout=(5, 30)) as response:
+            if response.status_code != 200:
+                print_error(f"Error: {response.status_code}")
+                return False
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("data: "):
+                    statuses.append(json.loads(line[len("data: "):]).get("status"))
+                    print_info(f"Status: {statuses[-1]}")
+    except Exception as e:
+        print_error(f"Exception: {str(e)}")
         return False
-    except Exception:
+    # The first status is the current one; the order may already be final by
+    # the time the stream opens, otherwise a change must have been streamed
+    if not statuses or (statuses[0] not in FINAL_STATUSES and len(statuses) < 2):
+        print_error("No status change was streamed")
         return False
+    print_success("Status change streamed!")
+    return True
 
 def test_notifications():
     print_header("TEST 5: NOTIFICATIONS")